@@ -0,0 +1,222 @@
+"""各意向分数的增量汇总：条数、均值、方差，整体一份、按天各一份
+
+新文章到来时只把新行合并进来（Chan 等人的并行方差合并公式），
+意向栏和预测读取汇总值，开销只与意向数有关，与新闻总数无关。
+
+另外按 时间 列维护近期加权的分数（见 IntentAggregates.score）：
+DECAY_HALF_LIVES 中的半衰期各有一个指数衰减累加器，随新行增量更新；
+滑动窗口和其他半衰期由按小时分桶的条数/分数和现算，开销只与窗口内的小时数有关。
+"""
+from __future__ import annotations
+
+import bisect
+import math
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+HOUR = 3600
+# 持续增量维护的衰减半衰期（秒）；其他半衰期查询时由小时桶现算
+DECAY_HALF_LIVES = (6 * HOUR, 24 * HOUR, 3 * 24 * HOUR, 7 * 24 * HOUR)
+
+
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # 与均值之差的平方和
+
+    def merge(self, count: int, mean: float, m2: float):
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def sum(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else math.nan
+
+
+class DecayedMean:
+    """指数衰减加权平均，文章权重 2^(-(ref - t) / half_life)
+
+    ref 取见过的最新发布时间，出现更新的文章时整体缩放；加权平均是比值，
+    与“现在”是什么时候无关，所以不需要随时间重算。
+    """
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self.ref: Optional[float] = None
+        self.weighted = 0.0
+        self.weights = 0.0
+
+    def add(self, stamps: np.ndarray, values: np.ndarray):
+        import numpy as np
+        latest = float(stamps.max())
+        if self.ref is None:
+            self.ref = latest
+        elif latest > self.ref:
+            scale = 2.0 ** (-(latest - self.ref) / self.half_life)
+            self.weighted *= scale
+            self.weights *= scale
+            self.ref = latest
+        w = np.exp2(-(self.ref - stamps) / self.half_life)
+        self.weighted += float(w @ values)
+        self.weights += float(w.sum())
+
+    @property
+    def mean(self) -> float:
+        return self.weighted / self.weights if self.weights > 0 else math.nan
+
+
+def _timestamps(df: pd.DataFrame) -> Optional[pd.Series]:
+    """时间 列转成秒数（按本地时间、不换算时区），无法解析的为 NaN"""
+    import pandas as pd
+    if '时间' not in df.columns:
+        return None
+    parsed = pd.to_datetime(df['时间'].astype(str), errors='coerce')
+    return (parsed - pd.Timestamp(0)).dt.total_seconds()
+
+
+def now_seconds() -> float:
+    """与 _timestamps 同一口径（本地时间）的当前时间"""
+    return (datetime.now() - datetime(1970, 1, 1)).total_seconds()
+
+
+class IntentAggregates:
+    def __init__(self):
+        self.total: Dict[str, RunningStats] = {}
+        # {意向: {'YYYY-MM-DD': RunningStats}}
+        self.daily: Dict[str, Dict[str, RunningStats]] = {}
+        # {意向: {半衰期: DecayedMean}}
+        self.decayed: Dict[str, Dict[float, DecayedMean]] = {}
+        # {意向: {小时序号: [条数, 分数和]}}，以及排好序的小时序号
+        self.hourly: Dict[str, Dict[int, list]] = {}
+        self.hour_keys: Dict[str, List[int]] = {}
+        self.rows = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, intents: Iterable[str]) -> IntentAggregates:
+        aggregates = cls()
+        aggregates.add_frame(df, intents)
+        return aggregates
+
+    def add_frame(self, df: pd.DataFrame, intents: Iterable[str]):
+        """合并新追加的行；空分数（NaN）不计入"""
+        if df is None or df.empty:
+            return
+        self.rows += len(df)
+        days = df['时间'].astype(str).str[:10] if '时间' in df.columns else None
+        stamps = _timestamps(df)
+        for intent in intents:
+            if intent not in df.columns:
+                continue
+            values = df[intent].astype(float)
+            self._merge(self.total.setdefault(intent, RunningStats()), values)
+            if stamps is not None:
+                self._add_timed(intent, stamps, values)
+            if days is None:
+                continue
+            buckets = self.daily.setdefault(intent, {})
+            grouped = values.groupby(days)
+            for day, count, mean, var in zip(
+                grouped.count().index, grouped.count(), grouped.mean(), grouped.var(ddof=0)
+            ):
+                if count:
+                    buckets.setdefault(day, RunningStats()).merge(int(count), float(mean), float(var) * count)
+
+    def _add_timed(self, intent: str, stamps: pd.Series, values: pd.Series):
+        import numpy as np
+        valid = (stamps.notna() & values.notna()).to_numpy()
+        if not valid.any():
+            return
+        t = stamps.to_numpy()[valid]
+        v = values.to_numpy()[valid]
+        decayed = self.decayed.setdefault(intent, {})
+        for half_life in DECAY_HALF_LIVES:
+            decayed.setdefault(half_life, DecayedMean(half_life)).add(t, v)
+
+        hours, inverse = np.unique((t // HOUR).astype(np.int64), return_inverse=True)
+        counts = np.bincount(inverse)
+        sums = np.bincount(inverse, weights=v)
+        buckets = self.hourly.setdefault(intent, {})
+        keys = self.hour_keys.setdefault(intent, [])
+        for hour, count, total in zip(hours.tolist(), counts.tolist(), sums.tolist()):
+            bucket = buckets.get(hour)
+            if bucket is None:
+                buckets[hour] = [count, total]
+                bisect.insort(keys, hour)
+            else:
+                bucket[0] += count
+                bucket[1] += total
+
+    @staticmethod
+    def _merge(stats: RunningStats, values: pd.Series):
+        count = int(values.count())
+        if count:
+            stats.merge(count, float(values.mean()), float(values.var(ddof=0)) * count)
+
+    def mean(self, intent: str) -> float:
+        stats = self.total.get(intent)
+        return stats.mean if stats and stats.count else math.nan
+
+    def means(self, intents: Iterable[str]) -> Dict[str, float]:
+        return {intent: self.mean(intent) for intent in intents}
+
+    def score(
+        self,
+        intent: str,
+        window: Optional[float] = None,
+        half_life: Optional[float] = None,
+        now: Optional[float] = None
+    ) -> Tuple[float, float]:
+        """近期加权的平均分，返回 (分数, 参与的文章数或有效权重)；没有数据时分数为 NaN
+
+        window 为只看最近多少秒（按小时对齐），half_life 为衰减半衰期（秒），
+        都为 None 时就是全部文章的平均分。
+        """
+        if window is None:
+            if half_life is None:
+                stats = self.total.get(intent)
+                return (stats.mean, stats.count) if stats and stats.count else (math.nan, 0)
+            accumulator = self.decayed.get(intent, {}).get(half_life)
+            if accumulator is not None:
+                return accumulator.mean, accumulator.weights
+
+        keys = self.hour_keys.get(intent, [])
+        if not keys:
+            return math.nan, 0
+        buckets = self.hourly[intent]
+        if window is not None:
+            now = now_seconds() if now is None else now
+            keys = keys[bisect.bisect_left(keys, int((now - window) // HOUR)):]
+            ref = now
+        else:
+            ref = keys[-1] * HOUR + HOUR / 2
+        weights = weighted = 0.0
+        for hour in keys:
+            count, total = buckets[hour]
+            w = 2.0 ** (-(ref - (hour * HOUR + HOUR / 2)) / half_life) if half_life else 1.0
+            weights += w * count
+            weighted += w * total
+        return (weighted / weights, weights) if weights > 0 else (math.nan, 0)
+
+    def scores(self, intents: Iterable[str], **kwargs) -> Dict[str, float]:
+        return {intent: self.score(intent, **kwargs)[0] for intent in intents}
+
+    def daily_means(self, intent: str) -> List[tuple]:
+        """[(日期, 条数, 均值)]，按日期排序"""
+        return [
+            (day, stats.count, stats.mean)
+            for day, stats in sorted(self.daily.get(intent, {}).items())
+        ]
@@ -0,0 +1,255 @@
+"""录制/回放抓取结果，用固定语料离线重跑 下载 → 提取 → 打分 流水线
+
+录制时 http_client 的 Session 换成会把每个成功响应写进 SQLite 存档的适配器；
+回放时换成只从存档读取的本地替身，不访问网络，缺失的地址返回 404。
+同一个 RSS 源每次录到的内容不同就另存一份快照，回放时每份快照当作一个源，
+多次录制可以累积出上千篇文章的语料。
+
+用法:
+    python archive.py record [--archive 路径] [--max-articles N]
+    python archive.py replay [--archive 路径] [--max-articles N] [--latency 毫秒]
+    python archive.py info [--archive 路径]
+
+录制和回放都写入临时新闻库，不影响正式的 news.sqlite。
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Iterable, List, Optional
+
+import http_client
+
+ARCHIVE_PATH = 'replay_archive.sqlite'
+
+# 快照地址形如 <rss>#snapshot=<id>，片段不会发到服务器
+SNAPSHOT_MARK = '#snapshot='
+
+
+class HttpArchive:
+    """SQLite 存档：正文页每个地址只存第一次录到的版本，RSS 源按内容存多份快照
+
+    跳转响应也会保存（status 和 location），回放时照样跳转。
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    id INTEGER PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    status INTEGER NOT NULL DEFAULT 200,
+                    location TEXT,
+                    content_type TEXT,
+                    body BLOB NOT NULL,
+                    recorded_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_url ON responses (url);
+            ''')
+            self.conn.commit()
+
+    def record(
+        self, url: str, kind: str, content_type: Optional[str], body: bytes,
+        status: int = 200, location: Optional[str] = None
+    ) -> bool:
+        """保存一个响应，已有相同内容时不重复保存；返回是否新写入"""
+        with self.lock, self.conn:
+            if kind == 'feed':
+                row = self.conn.execute(
+                    'SELECT 1 FROM responses WHERE url = ? AND body = ?', (url, body)
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    'SELECT 1 FROM responses WHERE url = ?', (url,)
+                ).fetchone()
+            if row:
+                return False
+            self.conn.execute(
+                'INSERT INTO responses (url, kind, status, location, content_type, body, recorded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, kind, status, location, content_type, body, time.time())
+            )
+            return True
+
+    def get(self, url: str):
+        """返回 (status, location, content_type, body)；快照地址按 id 查，否则取该地址最新的版本"""
+        base, _, snapshot = url.partition(SNAPSHOT_MARK)
+        with self.lock:
+            if snapshot.isdigit():
+                return self.conn.execute(
+                    'SELECT status, location, content_type, body FROM responses WHERE id = ?', (int(snapshot),)
+                ).fetchone()
+            return self.conn.execute(
+                'SELECT status, location, content_type, body FROM responses '
+                'WHERE url = ? ORDER BY id DESC LIMIT 1',
+                (base.partition('#')[0],)
+            ).fetchone()
+
+    def feed_snapshots(self) -> List[str]:
+        """所有 RSS 快照的回放地址，按录制顺序"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, url FROM responses WHERE kind = 'feed' ORDER BY id"
+            ).fetchall()
+        return [f'{url}{SNAPSHOT_MARK}{id_}' for id_, url in rows]
+
+    def counts(self) -> dict:
+        with self.lock:
+            return dict(self.conn.execute(
+                'SELECT kind, COUNT(*) FROM responses GROUP BY kind'
+            ).fetchall())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def recording_adapter(archive: HttpArchive, feed_urls: Iterable[str]):
+    """照常联网，同时把 200 和跳转响应写进存档；feed_urls 中的地址记为 RSS 快照"""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # 和实际请求一样规范化，例如补上末尾的 /
+    feeds = {requests.Request('GET', url).prepare().url for url in feed_urls}
+
+    class RecordingAdapter(HTTPAdapter):
+        def send(self, request, **kwargs):
+            # 录制要拿到完整内容，不发条件请求
+            request.headers.pop('If-None-Match', None)
+            request.headers.pop('If-Modified-Since', None)
+            response = super().send(request, **kwargs)
+            if response.status_code == 200 or response.is_redirect:
+                archive.record(
+                    request.url,
+                    'feed' if request.url in feeds else 'page',
+                    response.headers.get('Content-Type'),
+                    response.content,
+                    response.status_code,
+                    response.headers.get('Location')
+                )
+            return response
+
+    return RecordingAdapter(pool_connections=http_client.POOL_SIZE, pool_maxsize=http_client.POOL_SIZE)
+
+
+def replay_adapter(archive: HttpArchive, latency: float = 0.0):
+    """不联网，从存档构造响应；latency 秒模拟每个请求的网络延迟"""
+    from requests.adapters import BaseAdapter
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    class ReplayAdapter(BaseAdapter):
+        def send(self, request, **kwargs):
+            if latency:
+                time.sleep(latency)
+            row = archive.get(request.url)
+            response = Response()
+            response.request = request
+            response.url = request.url
+            if row is None:
+                response.status_code, response.reason, response._content = 404, 'Not Archived', b''
+            else:
+                status, location, content_type, body = row
+                response.status_code, response.reason, response._content = status, 'OK', bytes(body)
+                headers = {'Content-Type': content_type, 'Location': location}
+                response.headers = CaseInsensitiveDict({k: v for k, v in headers.items() if v})
+                if content_type:
+                    response.encoding = get_encoding_from_headers(response.headers)
+            return response
+
+        def close(self):
+            pass
+
+    return ReplayAdapter()
+
+
+def install(adapter):
+    """让 http_client 的共享 Session 通过 adapter 收发所有请求"""
+    session = http_client.get_session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+
+def run_collector(feeds: Optional[List[str]], **kwargs) -> dict:
+    """在临时新闻库里跑一次 fetch_news，返回新增篇数、耗时和各阶段统计"""
+    import collect_news
+    import news_store
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = news_store.NewsStore(os.path.join(folder, 'news.sqlite'), legacy_excel=None)
+        previous = news_store.use_store(store)
+        added = 0
+
+        def count(row_data):
+            nonlocal added
+            added += 1
+
+        started = time.perf_counter()
+        try:
+            collect_news.fetch_news(
+                news_callback=count, use_cache=False, feeds=feeds, update_current=False, **kwargs
+            )
+        finally:
+            elapsed = time.perf_counter() - started
+            news_store.use_store(previous)
+            store.close()
+    stats = collect_news.last_pipeline.stats() if collect_news.last_pipeline else []
+    return {'added': added, 'seconds': elapsed, 'stages': stats, 'metrics': collect_news.last_metrics}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制/回放抓取结果")
+    parser.add_argument("mode", choices=['record', 'replay', 'info'])
+    parser.add_argument("--archive", default=ARCHIVE_PATH, help=f"存档路径，默认 {ARCHIVE_PATH}")
+    parser.add_argument("--max-articles", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4, help="下载线程数")
+    parser.add_argument("--cpu-workers", type=int, default=2, help="分词打分进程数")
+    parser.add_argument("--latency", type=float, default=0, help="回放时每个请求模拟的延迟（毫秒）")
+    args = parser.parse_args()
+
+    archive = HttpArchive(args.archive)
+    if args.mode == 'info':
+        counts = archive.counts()
+        print(f"{args.archive}: RSS 快照 {counts.get('feed', 0)} 份，网页 {counts.get('page', 0)} 个")
+        return
+
+    import collect_news
+    if args.mode == 'record':
+        install(recording_adapter(archive, collect_news.RSS_URLS))
+        feeds = None
+        rate = 2.0
+    else:
+        install(replay_adapter(archive, args.latency / 1000))
+        feeds = archive.feed_snapshots()
+        if not feeds:
+            print("存档里没有 RSS 快照，先运行 record")
+            return
+        # 回放不访问真实站点，不需要限速
+        rate = 1e9
+
+    result = run_collector(
+        feeds,
+        max_articles=args.max_articles,
+        workers=args.workers,
+        cpu_workers=args.cpu_workers,
+        per_host_rate=rate
+    )
+    print(f"{args.mode}: 新增 {result['added']} 篇，耗时 {result['seconds']:.2f} 秒"
+          f"（{result['added'] / result['seconds']:.1f} 篇/秒）")
+    for stats in result['stages']:
+        print(f"  {stats}")
+    if result['metrics']:
+        print(result['metrics'].format_summary())
+    if args.mode == 'record':
+        counts = archive.counts()
+        print(f"存档 {args.archive}: RSS 快照 {counts.get('feed', 0)} 份，网页 {counts.get('page', 0)} 个")
+
+
+if __name__ == "__main__":
+    main()
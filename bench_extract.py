@@ -0,0 +1,81 @@
+"""备用正文提取基准：对比 BeautifulSoup 与 lxml 两条路径的耗时和结果是否一致
+
+样本页来自 http_cache.sqlite 里缓存的网页，也可以指定一个放 .html 文件的目录。
+用法: python bench_extract.py [--pages 目录] [--limit N] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import sqlite3
+import statistics
+import time
+
+import http_client
+from collect_news import extract_content_with_bs, parse_date_from_text
+import fast_extract
+
+
+def load_pages(folder, limit):
+    if folder:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(folder, '*.html')))[:limit]:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                pages.append((path, f.read()))
+        return pages
+    if not os.path.exists(http_client.CACHE_PATH):
+        return []
+    conn = sqlite3.connect(http_client.CACHE_PATH)
+    try:
+        return conn.execute('SELECT url, html FROM pages LIMIT ?', (limit,)).fetchall()
+    finally:
+        conn.close()
+
+
+def measure(func, pages, repeat):
+    """返回每页耗时中位数（毫秒）和最后一轮的结果"""
+    samples = []
+    results = []
+    for _ in range(repeat):
+        results = []
+        for url, html in pages:
+            started = time.perf_counter()
+            results.append(func(html, url))
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", help="样本 .html 文件所在目录，默认读取网页缓存")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages, args.limit)
+    if not pages:
+        print("没有样本页：先运行一次采集，或用 --pages 指定目录")
+        return
+
+    bs_ms, bs_results = measure(extract_content_with_bs, pages, args.repeat)
+    lxml_ms, lxml_results = measure(
+        lambda html, url: fast_extract.extract_content(html, url, parse_date_from_text),
+        pages, args.repeat
+    )
+
+    same = {'title': 0, 'content': 0, 'publish_date': 0}
+    for (url, _), a, b in zip(pages, bs_results, lxml_results):
+        a, b = a or {}, b or {}
+        for key in same:
+            if a.get(key) == b.get(key):
+                same[key] += 1
+            else:
+                print(f"不一致 {key}: {url}")
+
+    print(f"样本 {len(pages)} 页，每页耗时中位数：")
+    print(f"  BeautifulSoup {bs_ms:8.2f} ms")
+    print(f"  lxml          {lxml_ms:8.2f} ms  ({bs_ms / lxml_ms:.1f}x)")
+    print("结果一致：" + "，".join(f"{key} {n}/{len(pages)}" for key, n in same.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""启动耗时基准：在全新的解释器里测量各模块的导入时间以及首次加载模型的时间
+
+用法: python bench_startup.py [--repeat N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# 每一项在单独的子进程里执行，互不共享已导入的模块
+CASES = [
+    ("import collect_news", "import collect_news"),
+    ("import predict (GUI)", "import predict"),
+    ("读取新闻库", "import collect_news; collect_news.get_current_news()"),
+    ("首次加载模型", "import collect_news; collect_news.get_scorer()"),
+]
+
+TIMER = (
+    "import time, sys; _t = time.perf_counter(); {stmt}; "
+    "sys.stdout.write(repr(time.perf_counter() - _t))"
+)
+
+
+def measure(stmt: str, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", TIMER.format(stmt=stmt)],
+            capture_output=True, text=True
+        )
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, stmt in CASES:
+        samples, error = measure(stmt, args.repeat)
+        if samples is None:
+            print(f"{name:<24} 失败: {error}")
+            continue
+        print(
+            f"{name:<24} 中位数 {statistics.median(samples) * 1000:8.1f} ms"
+            f"  最小 {min(samples) * 1000:8.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,348 @@
-import jieba
+import hashlib
 import json
 import math
+import os
+import struct
+import zlib
+import numpy as np
+from scipy import sparse
+from scipy.special import expit
+import token_cache
+
+# 二进制模型文件头；NBW1 只存了两类各自的对数似然，读取时现算似然比
+MAGIC=b'NBW2'
+MAGIC_V1=b'NBW1'
 
 def text_to_wordlist(text):
-    wordss=jieba.cut(text)
-    words=set(wordss)
-    return words
-def train(train_data_news,train_data_labels):
-    all_words=[]
-    positive={}
-    nagetive={}
-    wordlist=[]
-    total_train_data=0
-    positive_data=0
-    nagetive_data=0
+    # 按内容哈希缓存，同一篇文本无论被多少模型或训练轮次使用都只分词一次
+    return token_cache.tokenize(text)
+def new_model():
+    return {
+        'wordlist': [],
+        'positive': {},
+        'nagetive': {},
+        'total_data': 0,
+        'positive_data': 0,
+        'nagetive_data': 0
+    }
+def partial_fit(train_data,train_data_news,train_data_labels,refresh=True):
+    """在已有计数上累加新样本，原地更新模型并返回
+
+    refresh=False 时只累加计数，适合并行训练中先分块计数、最后再合并。
+    """
+    positive=train_data['positive']
+    nagetive=train_data['nagetive']
     for news,label in zip(train_data_news,train_data_labels):
-        total_train_data+=1
+        train_data['total_data']+=1
         if label==1:
-            positive_data+=1
+            train_data['positive_data']+=1
         else:
-            nagetive_data+=1
+            train_data['nagetive_data']+=1
         words=text_to_wordlist(news)
         for word in words:
-            if word not in all_words:
-                all_words.append(word)
             if label==1:
                 positive[word]=positive.get(word,0)+1
                 nagetive[word]=nagetive.get(word,0)+0
             else:
                 positive[word]=positive.get(word,0)+0
                 nagetive[word]=nagetive.get(word,0)+1
-    for word in all_words:
-        if abs(0.5-positive[word]/(positive[word]+nagetive[word]))>=0.01:
-            wordlist.append(word)
-    return {
-        'wordlist': wordlist,
-        'positive': positive,
-        'nagetive': nagetive,
-        'total_data': total_train_data,
-        'positive_data': positive_data,
-        'nagetive_data': nagetive_data
-    }
-def check(news,train_data):
-    wordlist=train_data['wordlist']
+    if refresh:
+        refresh_wordlist(train_data)
+    return train_data
+def merge(train_data,other,refresh=True):
+    """把另一份计数并入 train_data，原地更新并返回"""
+    positive=train_data['positive']
+    nagetive=train_data['nagetive']
+    for word,count in other['positive'].items():
+        positive[word]=positive.get(word,0)+count
+    for word,count in other['nagetive'].items():
+        nagetive[word]=nagetive.get(word,0)+count
+    for key in ('total_data','positive_data','nagetive_data'):
+        train_data[key]+=other[key]
+    if refresh:
+        refresh_wordlist(train_data)
+    return train_data
+def _log(x):
+    return math.log(x) if x>0 else -math.inf
+def refresh_wordlist(train_data):
+    """重新筛选 wordlist，并生成打分直接使用的对数似然比表和对数先验比"""
     positive=train_data['positive']
     nagetive=train_data['nagetive']
-    total_data=train_data['total_data']
     positive_data=train_data['positive_data']
     nagetive_data=train_data['nagetive_data']
-    if total_data==0:
+    wordlist=[
+        word for word in positive
+        if abs(0.5-positive[word]/(positive[word]+nagetive[word]))>=0.01
+    ]
+    train_data['wordlist']=wordlist
+    train_data['log_prior']=_log(positive_data)-_log(nagetive_data)
+    train_data['log_likelihood']={
+        word: math.log((positive[word]+1)/(positive_data+len(wordlist)))
+             -math.log((nagetive[word]+1)/(nagetive_data+len(wordlist)))
+        for word in wordlist
+    }
+    train_data['version']=model_version(train_data)
+def model_version(train_data):
+    """由先验和对数似然比算出的版本号：打分结果只取决于这两者，内容相同版本就相同"""
+    h=hashlib.sha1(repr(float(train_data['log_prior'])).encode())
+    for word,value in sorted(train_data['log_likelihood'].items()):
+        h.update(f'\n{word}\t{float(value)!r}'.encode('utf-8'))
+    return h.hexdigest()
+def train(train_data_news,train_data_labels):
+    return partial_fit(new_model(),train_data_news,train_data_labels)
+class LogTable:
+    """二进制模型的 词->对数似然比 只读映射
+
+    词表、散列表和数值都留在内存映射里，查一个词只解码探测到的几个词，
+    常驻内存和加载时间不随词表增长；没有散列表的旧文件退回解码成字典。
+    """
+    def __init__(self,arrays,size):
+        self.offsets=arrays['offsets'].view(np.ndarray)
+        self.blob=arrays['blob'].view(np.ndarray)
+        self.values=arrays['llr'].view(np.ndarray)
+        self.slots=arrays['slots'].view(np.ndarray) if 'slots' in arrays else None
+        self.size=size
+        self.index=None
+        if self.slots is None:
+            self.index={word:i for i,word in enumerate(_decode_words(arrays,size))}
+    def _find(self,word):
+        if self.index is not None:
+            return self.index.get(word)
+        key=word.encode('utf-8')
+        mask=len(self.slots)-1
+        slot=zlib.crc32(key)&mask
+        while True:
+            i=int(self.slots[slot])
+            if i<0:
+                return None
+            start=int(self.offsets[i])
+            end=int(self.offsets[i+1])
+            if end-start==len(key) and self.blob[start:end].tobytes()==key:
+                return i
+            slot=(slot+1)&mask
+    def get(self,word,default=None):
+        i=self._find(word)
+        if i is None:
+            return default
+        return float(self.values[i])
+    def __contains__(self,word):
+        return self._find(word) is not None
+    def items(self):
+        return zip(_decode_words({'offsets':self.offsets,'blob':self.blob},self.size),self.values.tolist())
+    def __len__(self):
+        return self.size
+def _logaddexp(a,b):
+    m=max(a,b)
+    if m==math.inf:
+        return m
+    return m+math.log1p(math.exp(-abs(a-b)))
+def check(news,train_data):
+    if train_data['total_data']==0:
         print("Due to data lackage, unpredictable!\n")
         return 0.5
-    p_positive=positive_data/total_data
-    p_nagetive=nagetive_data/total_data
-    words=text_to_wordlist(news)
-    p_pos=0
-    p_nag=0
-    for word in words:
-        if word in wordlist:
-            p=(positive[word]+1)/(positive_data+len(wordlist))
-            p_pos=p_pos+math.log10(p)
-            p=(nagetive[word]+1)/(nagetive_data+len(wordlist))
-            p_nag=p_nag+math.log10(p)
-    p_pos=p_pos+math.log10(p_positive)
-    p_nag=p_nag+math.log10(p_nagetive)
-    p_pos=math.pow(10,p_pos)
-    p_nag=math.pow(10,p_nag)
-    if p_pos+p_nag==0:
-        print("Unknown calculating mistake!\n")
-        return 0.5
-    return p_pos/(p_pos+p_nag)
+    log_likelihood=train_data['log_likelihood']
+    # 正负两类对数后验之差，每个词只需一次查表和一次加法
+    score=train_data['log_prior']
+    for word in text_to_wordlist(news):
+        score+=log_likelihood.get(word,0)
+    # P(正)=exp(-logsumexp(0,-score))，长文章也不会下溢成 0
+    return math.exp(-_logaddexp(0,-score))
+
+def build_scorer(models):
+    """把所有意向模型的对数似然比堆叠成一个稀疏矩阵，供 check_batch 一次性打分"""
+    names=list(models)
+    vocab={}
+    rows=[]
+    cols=[]
+    vals=[]
+    bias=np.zeros(len(names))
+    unknown=np.zeros(len(names),dtype=bool)
+    versions=[models[name].get('version') for name in names]
+    for j,name in enumerate(names):
+        train_data=models[name]
+        if train_data['total_data']==0:
+            unknown[j]=True
+            continue
+        # 先验为 0 的一类得到 ±inf，后验自然落到 0 或 1
+        bias[j]=train_data['log_prior']
+        for word,value in train_data['log_likelihood'].items():
+            rows.append(vocab.setdefault(word,len(vocab)))
+            cols.append(j)
+            vals.append(value)
+    weights=sparse.csc_matrix((vals,(rows,cols)),shape=(len(vocab),len(names)))
+    return {
+        'names': names,
+        'vocab': vocab,
+        'weights': weights,
+        'bias': bias,
+        'unknown': unknown,
+        'versions': versions
+    }
+def check_batch(news_list,scorer):
+    """对一批新闻同时计算所有模型的正面概率，返回 (新闻数, 模型数) 的数组"""
+    vocab=scorer['vocab']
+    indptr=[0]
+    indices=[]
+    for news in news_list:
+        indices.extend(vocab[word] for word in text_to_wordlist(news) if word in vocab)
+        indptr.append(len(indices))
+    docs=sparse.csr_matrix((np.ones(len(indices)),indices,indptr),shape=(len(news_list),len(vocab)))
+    scores=expit((docs@scorer['weights']).toarray()+scorer['bias'])
+    scores[:,scorer['unknown']]=0.5
+    return scores
 
+def _pad(size):
+    return (size+7)//8*8
+def _hash_slots(encoded):
+    """wordlist 的开放寻址散列表（crc32 + 线性探测），槽里存词的序号，空槽为 -1"""
+    slots=8
+    while slots<2*len(encoded):
+        slots*=2
+    mask=slots-1
+    table=[-1]*slots
+    for i,key in enumerate(encoded):
+        slot=zlib.crc32(key)&mask
+        while table[slot]>=0:
+            slot=(slot+1)&mask
+        table[slot]=i
+    return np.array(table,dtype='<i8')
 def save(data, filename):
+    if filename.endswith('.bin'):
+        save_binary(data, filename)
+        return
     with open(filename, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=4)
+def save_binary(data, filename):
+    """写成可内存映射的二进制模型：词表 + 连续的计数和对数似然比数组
+
+    wordlist 中的词排在词表最前面，对数似然比数组只覆盖这一段；
+    其余词只保留计数，供增量训练使用。
+    """
+    wordlist=data['wordlist']
+    positive=data['positive']
+    nagetive=data['nagetive']
+    in_wordlist=set(wordlist)
+    words=wordlist+[word for word in positive if word not in in_wordlist]
+    encoded=[word.encode('utf-8') for word in words]
+    offsets=np.zeros(len(words)+1,dtype='<u8')
+    offsets[1:]=np.cumsum([len(b) for b in encoded],dtype='<u8')
+    pos=np.array([positive[word] for word in words],dtype='<i8')
+    neg=np.array([nagetive[word] for word in words],dtype='<i8')
+    size=len(wordlist)
+    log_likelihood=data['log_likelihood']
+    llr=np.array([log_likelihood[word] for word in wordlist],dtype='<f8')
+    slots=_hash_slots(encoded[:size])
+    blob=b''.join(encoded)
+    header=json.dumps({
+        'total_data': data['total_data'],
+        'positive_data': data['positive_data'],
+        'nagetive_data': data['nagetive_data'],
+        'log_prior': data['log_prior'],
+        'vocab_size': len(words),
+        'wordlist_size': size,
+        'blob_size': len(blob),
+        'sources': data.get('sources'),
+        'version': data.get('version') or model_version(data),
+        'hash_slots': len(slots)
+    }, ensure_ascii=False).encode('utf-8')
+    sections=[
+        MAGIC+struct.pack('<I',len(header))+header,
+        offsets.tobytes(), blob, pos.tobytes(), neg.tobytes(), llr.tobytes(), slots.tobytes()
+    ]
+    # 先写临时文件再替换，避免读者映射到写了一半的文件
+    tmp=filename+'.tmp'
+    with open(tmp, "wb") as f:
+        for section in sections:
+            f.write(section)
+            f.write(b'\0'*(_pad(len(section))-len(section)))
+    os.replace(tmp, filename)
+def _read_binary(filename):
+    buf=np.memmap(filename,dtype=np.uint8,mode='r')
+    header_len=struct.unpack('<I',bytes(buf[4:8]))[0]
+    header=json.loads(bytes(buf[8:8+header_len]).decode('utf-8'))
+    vocab_size=header['vocab_size']
+    size=header['wordlist_size']
+    pos=_pad(8+header_len)
+    sections=[
+        ('offsets', 8*(vocab_size+1), '<u8'),
+        ('blob', header['blob_size'], np.uint8),
+        ('positive', 8*vocab_size, '<i8'),
+        ('nagetive', 8*vocab_size, '<i8'),
+    ]
+    if bytes(buf[:4])==MAGIC_V1:
+        sections+=[('log_pos', 8*size, '<f8'), ('log_neg', 8*size, '<f8')]
+    else:
+        sections+=[('llr', 8*size, '<f8')]
+    # 较早的 NBW2 文件没有散列表
+    if header.get('hash_slots'):
+        sections+=[('slots', 8*header['hash_slots'], '<i8')]
+    arrays={}
+    for name,nbytes,dtype in sections:
+        arrays[name]=buf[pos:pos+nbytes].view(dtype)
+        pos+=_pad(nbytes)
+    if 'llr' not in arrays:
+        arrays['llr']=arrays['log_pos']-arrays['log_neg']
+        header['log_prior']=_log(header['positive_data'])-_log(header['nagetive_data'])
+    return header,arrays
+def _decode_words(arrays,count):
+    offsets=arrays['offsets'][:count+1].tolist()
+    raw=bytes(arrays['blob'][:offsets[-1]])
+    return [raw[offsets[i]:offsets[i+1]].decode('utf-8') for i in range(count)]
+def load_binary(filename):
+    """映射二进制模型，词表和数值都不解码，按需在映射里查找"""
+    header,arrays=_read_binary(filename)
+    data={
+        'format': 'binary',
+        'log_likelihood': LogTable(arrays,header['wordlist_size']),
+        'log_prior': header['log_prior'],
+        'total_data': header['total_data'],
+        'positive_data': header['positive_data'],
+        'nagetive_data': header['nagetive_data'],
+        'sources': header.get('sources')
+    }
+    # 早期的二进制模型文件头里没有版本号，现算
+    data['version']=header.get('version') or model_version(data)
+    return data
+def _is_binary(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) in (MAGIC,MAGIC_V1)
 def load(filename):
+    if _is_binary(filename):
+        return load_binary(filename)
     with open(filename, "r", encoding="utf-8") as f:
         data = json.load(f)
+    # 旧的 weight.json 没有预先算好的表，读取时补上
+    if 'log_likelihood' not in data:
+        refresh_wordlist(data)
+    else:
+        data['version']=model_version(data)
     return data
+def read_version(filename):
+    """只读模型的版本号；二进制模型只需读文件头"""
+    if _is_binary(filename):
+        header,_=_read_binary(filename)
+        if header.get('version'):
+            return header['version']
+    return load(filename)['version']
+def load_counts(filename):
+    """读取带完整计数的模型（两种格式都支持），用于继续训练"""
+    if not _is_binary(filename):
+        return load(filename)
+    header,arrays=_read_binary(filename)
+    words=_decode_words(arrays,header['vocab_size'])
+    size=header['wordlist_size']
+    return {
+        'wordlist': words[:size],
+        'positive': dict(zip(words,arrays['positive'].tolist())),
+        'nagetive': dict(zip(words,arrays['nagetive'].tolist())),
+        'total_data': header['total_data'],
+        'positive_data': header['positive_data'],
+        'nagetive_data': header['nagetive_data'],
+        'log_prior': header['log_prior'],
+        'log_likelihood': dict(zip(words[:size],arrays['llr'].tolist())),
+        'sources': header.get('sources'),
+        'version': header.get('version')
+    }
 
 if __name__=="__main__":
     train_news = [
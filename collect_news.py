@@ -1,16 +1,26 @@
-import feedparser
-from newspaper import Article
-import pandas as pd
+from __future__ import annotations
+
 import os
-from classifier import load, check
-from typing import Callable, List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple, TYPE_CHECKING
 import logging
-import requests
-from bs4 import BeautifulSoup
+import threading
 import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import zip_longest
 from datetime import datetime
 import re
 
+import http_client
+import metrics
+from pipeline import Pipeline, Stage
+from rate_limit import HostRateLimiter
+
+# pandas、newspaper、bs4、feedparser、requests 以及分类器依赖的
+# numpy/scipy 都比较重，只在真正用到的函数里导入，保证 import 本模块足够快
+if TYPE_CHECKING:
+    import pandas as pd
+
 # 配置日志
 logging.basicConfig(
     level=logging.DEBUG,
@@ -20,36 +30,67 @@ logging.basicConfig(
 
 # Global variable to store the latest news DataFrame
 current_news_df: Optional[pd.DataFrame] = None
+# current_news_df 已包含的最大文章 id，之后只从新闻库读更新的文章
+current_news_id = 0
 
-# 获取所有模型
-def load_all_models(base_folder='train_set'):
-    models = {}
+def model_files(base_folder='train_set') -> Dict[str, str]:
+    """各意向的权重文件，优先使用可内存映射的二进制模型"""
+    files = {}
     try:
         subfolders = [f.path for f in os.scandir(base_folder) if f.is_dir()]
-        for folder in subfolders:
-            weight_file = os.path.join(folder, 'weight.json')
-            if os.path.exists(weight_file):
-                folder_name = os.path.basename(folder)
-                models[folder_name] = load(weight_file)
-                print(f"已加载模型: {folder_name}")
     except FileNotFoundError:
         print(f"警告: 未找到训练集文件夹 {base_folder}")
+        return files
+    for folder in subfolders:
+        for weight_name in ('weight.bin', 'weight.json'):
+            weight_file = os.path.join(folder, weight_name)
+            if os.path.exists(weight_file):
+                files[os.path.basename(folder)] = weight_file
+                break
+    return files
+
+# 获取所有模型
+def load_all_models(base_folder='train_set', names: Optional[List[str]] = None):
+    """names 不为空时只加载这些意向"""
+    from classifier import load
+    models = {}
+    for folder_name, weight_file in model_files(base_folder).items():
+        if names is not None and folder_name not in names:
+            continue
+        models[folder_name] = load(weight_file)
+        print(f"已加载模型: {folder_name}")
     return models
 
-# 加载所有模型
-models = load_all_models()
+# 模型在第一次分类时才加载
+models: Optional[Dict] = None
+scorer: Optional[Dict] = None
 
-# 动态更新模型钩子
-def update_models():
+def get_models() -> Dict:
     global models
-    models = load_all_models()
+    if models is None:
+        models = load_all_models()
+    return models
+
+def get_scorer() -> Dict:
+    global scorer
+    if scorer is None:
+        from classifier import build_scorer
+        scorer = build_scorer(get_models())
+    return scorer
+
+# 动态更新模型钩子：丢弃已加载的模型，下次分类时重新读取
+def update_models():
+    """同时释放二进制模型的内存映射，之后训练才能在 Windows 上替换 weight.bin"""
+    global models, scorer
+    models = None
+    scorer = None
 
 # 配置：RSS 源可任意增删
 RSS_URLS = [
     'https://rss.aishort.top/?type=cneb',
 ]
 
-OUTPUT = 'news.xlsx'   # 也可改成 .csv
+OUTPUT = 'news.xlsx'   # 新闻存放在 news_store.DB_PATH，这里只是导出位置
 
 def extract_date_from_rss(entry):
     """从RSS条目提取日期"""
@@ -97,6 +138,7 @@ def parse_date_from_text(text):
 
 def extract_content_with_bs(html_content, url):
     """使用BeautifulSoup作为备用内容提取方法"""
+    from bs4 import BeautifulSoup
     try:
         soup = BeautifulSoup(html_content, 'html.parser')
         
@@ -174,17 +216,25 @@ def extract_content_with_bs(html_content, url):
         logging.error(f"BeautifulSoup解析失败: {e}")
         return None
 
-def extract_metadata_fallback(entry):
-    """当newspaper失败时的备用提取方法"""
+def extract_content_fast(html_content, url):
+    """优先用 lxml 快速提取（见 fast_extract），lxml 不可用或解析出错时退回 BeautifulSoup"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(entry.link, timeout=10, headers=headers)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
+        import fast_extract
+        return fast_extract.extract_content(html_content, url, parse_date_from_text)
+    except ImportError:
+        pass
+    except Exception as e:
+        logging.warning(f"lxml解析失败，改用BeautifulSoup: {e}")
+    return extract_content_with_bs(html_content, url)
+
+def extract_metadata_fallback(entry, html: Optional[str] = None):
+    """当newspaper失败时的备用提取方法；传入已下载的 html 时不再重复请求"""
+    try:
+        if html is None:
+            html = http_client.fetch_html(entry.link)
         
-        result = extract_content_with_bs(response.text, entry.link)
+        with metrics.timer('fallback_extract'):
+            result = extract_content_fast(html, entry.link)
         if result:
             # 使用RSS的标题作为备选
             result['title'] = result['title'] or entry.title
@@ -198,148 +248,515 @@ def extract_metadata_fallback(entry):
     
     return None
 
+def fetch_entry_html(
+    entry,
+    limiter: HostRateLimiter,
+    cache: Optional[http_client.HttpCache] = None
+) -> str:
+    """下载条目对应的网页；以前见过的 GUID/URL 直接用缓存，即使标题变了也不再下载"""
+    key = entry.get('id') or entry.link
+    html = cache.get_page(key, entry.link) if cache else None
+    if html is None:
+        with metrics.timer('rate_limit_wait'):
+            limiter.acquire(entry.link)
+        with metrics.timer('page_download'):
+            html = http_client.fetch_html(entry.link)
+        metrics.count('pages_downloaded')
+        if cache:
+            cache.put_page(key, entry.link, html)
+    else:
+        metrics.count('page_cache_hits')
+    return html
+
+def extract_entry(entry, html: str) -> Optional[Dict]:
+    """从已下载的 HTML 中提取标题、正文和发布时间；失败返回 None"""
+    from newspaper import Article
+
+    # newspaper 和备用方法解析同一份 HTML
+    article = Article(entry.link, language='zh', fetch_images=False)
+    # 只是把已下载的 HTML 交给 newspaper，不涉及网络
+    with metrics.timer('article_load'):
+        article.download(input_html=html)
+    with metrics.timer('article_parse'):
+        article.parse()
+    
+    # 提取信息
+    if not article.text or len(article.text.strip()) < 50:
+        logging.warning(f"newspaper提取内容不足，使用备用方法: {entry.link}")
+        metrics.count('fallback')
+        fallback_result = extract_metadata_fallback(entry, html)
+        if not fallback_result:
+            metrics.count('extract_failed')
+            return None
+        
+        title = fallback_result['title']
+        content = fallback_result['content']
+        publish_date = fallback_result['publish_date']
+    else:
+        title = article.title or entry.title
+        content = article.text.strip().replace('\n', ' ')
+        publish_date = article.publish_date
+    
+    # 如果还是提取不到日期，使用RSS中的日期
+    if not publish_date:
+        publish_date = extract_date_from_rss(entry)
+
+    return {'title': title, 'content': content, 'publish_date': publish_date}
+
+def fingerprint_content(content: str) -> Dict:
+    """分词并计算正文指纹；CPU 密集，可以放在子进程里运行
+
+    分词结果一并返回：打分可能在另一个子进程里进行，带过去就不必再分一次词。
+    子进程里记不了本轮的计时，各步耗时放在返回值的 timings 里由调用方记录。
+    """
+    from classifier import text_to_wordlist
+    import dedup
+
+    timings = {}
+    started = time.perf_counter()
+    words = text_to_wordlist(content)
+    timings['tokenize'] = time.perf_counter() - started
+    started = time.perf_counter()
+    fingerprint = dedup.simhash(words)
+    timings['simhash'] = time.perf_counter() - started
+    return {'simhash': fingerprint, 'words': words, 'timings': timings}
+
+def score_content(content: str, words: Optional[frozenset] = None) -> Dict:
+    """用所有模型给正文打分；words 为 fingerprint_content 已经算好的分词结果"""
+    import token_cache
+    from score_cache import score_texts
+
+    if words is not None:
+        token_cache.put(content, words)
+    scorer = get_scorer()
+    scores = None
+    timings = {}
+    try:
+        started = time.perf_counter()
+        # 同一篇正文用同一版本的模型打过分就直接取缓存
+        check_values = score_texts([content], scorer)[0]
+        timings['classify'] = time.perf_counter() - started
+        scores = {
+            model_name: float(f'{check_value:.4f}')
+            for model_name, check_value in zip(scorer['names'], check_values)
+        }
+    except Exception as e:
+        logging.error(f"Fail to classify with models: {e}")
+    return {'scores': scores, 'timings': timings}
+
+def poll_feeds(
+    urls: List[str],
+    cache: Optional[http_client.HttpCache] = None,
+    workers: Optional[int] = None
+) -> List[Tuple[str, List]]:
+    """并发拉取所有 RSS 源，总耗时约等于最慢的那个源；失败的源返回空列表
+
+    默认每个源一个线程；workers 可以限制同时拉取的源数。
+    """
+    import feedparser
+
+    def poll(rss):
+        try:
+            with metrics.timer('feed_download'):
+                body = http_client.fetch_feed(rss, cache)
+            with metrics.timer('feed_parse'):
+                entries = feedparser.parse(body).entries
+            metrics.count('feeds_polled')
+            metrics.count('entries_seen', len(entries))
+            return entries
+        except Exception as e:
+            logging.exception(f"Fail to parse RSS feed {rss}: {e}")
+            metrics.count('feeds_failed')
+            return []
+
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers or len(urls), len(urls))) as pool:
+        return list(zip(urls, pool.map(poll, urls)))
+
+def entry_timestamp(entry) -> float:
+    """RSS 条目的发布时间戳，没有时排在最后"""
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    if not parsed:
+        return float('-inf')
+    try:
+        return datetime(*parsed[:6]).timestamp()
+    except (TypeError, ValueError, OverflowError):
+        return float('-inf')
+
+def schedule_entries(feeds: List[Tuple[str, List]], order: str = 'round_robin'):
+    """决定各源条目的处理顺序，产出 (rss, entry)
+
+    round_robin：各源轮流出一条，全局名额在源之间平均分配；
+    freshness：所有源的条目按发布时间从新到旧排列。
+    """
+    if order == 'freshness':
+        merged = [(rss, entry) for rss, entries in feeds for entry in entries]
+        merged.sort(key=lambda pair: entry_timestamp(pair[1]), reverse=True)
+        yield from merged
+        return
+    for batch in zip_longest(*[[(rss, entry) for entry in entries] for rss, entries in feeds]):
+        for pair in batch:
+            if pair is not None:
+                yield pair
+
+# 最近一次拉取使用的流水线，拉取过程中可以调用 stats() 查看各阶段吞吐和积压
+last_pipeline: Optional[Pipeline] = None
+# 最近一次拉取的计时和计数，summary()/format_summary() 查看，同时追加到 metrics.METRICS_PATH
+last_metrics: Optional[metrics.RunMetrics] = None
+
 def fetch_news(
     progress_callback: Callable[[int, int], None] = None, 
     news_callback: Callable[[Dict], None] = None,
-    max_articles: int = 50
+    max_articles: int = 50,
+    per_feed_max: Optional[int] = None,
+    feed_order: str = 'round_robin',
+    workers: int = 4,
+    feed_workers: Optional[int] = None,
+    per_host_rate: float = 2.0,
+    use_cache: bool = True,
+    incremental: bool = False,
+    cpu_workers: int = 2,
+    queue_size: int = 16,
+    feeds: Optional[List[str]] = None,
+    cancel_event: Optional[threading.Event] = None,
+    update_current: bool = True
 ) -> pd.DataFrame:
-    global current_news_df
+    """拉取新闻并分类
+
+    所有 RSS 源并发拉取，本次最多新增 max_articles 篇，名额按 feed_order
+    （见 schedule_entries）在各源之间分配；per_feed_max 可再限制单个源的篇数。
+    处理分成 下载 → 提取 → 分词/指纹 → 打分 → 入库 几个阶段，阶段之间用长度为
+    queue_size 的队列连接，网络和 CPU 工作可以重叠：workers 个线程下载，
+    同一站点每秒最多 per_host_rate 个请求；分词和打分在 cpu_workers 个
+    子进程里完成（为 0 时在本进程的线程里完成），近似重复的正文不打分。去重、回调和入库在调用
+    线程里按 RSS 中的顺序逐条进行。use_cache 时 RSS 走条件请求，正文页按
+    GUID/URL 缓存在 http_client.CACHE_PATH。incremental 时只处理比上次
+    完整处理过的条目更新的条目（按发布时间，没有时间的按 GUID 位置判断）。
+    feeds 为要拉取的 RSS 源，默认 RSS_URLS；各源同时拉取，feed_workers 可以
+    限制同时拉取的源数。各环节的耗时和计数记在 last_metrics 里，结束时写入
+    日志和 metrics.METRICS_PATH。
+    cancel_event 被设置后尽快停止，已处理完的文章照常入库。
+
+    返回从新闻库同步后的 current_news_df，其中也包括后台采集进程写入的文章。
+    update_current=False 时（后台采集进程、自己维护新闻表的界面）不维护
+    current_news_df，只返回本轮新增的行。
+    """
+    import pandas as pd
+    from classifier import text_to_wordlist
+    import dedup
+
+    global last_pipeline, last_metrics
+    feeds = RSS_URLS if feeds is None else feeds
+    run = last_metrics = metrics.start_run()
+    scorer = get_scorer()
+    limiter = HostRateLimiter(rate=per_host_rate)
+    cache = http_client.get_cache() if use_cache else None
+    store = get_store()
     rows = []
+    stored = []
     total_processed = 0
+    # 本轮新增的标题；历史标题直接查新闻库索引
     existing_titles = set()
-    
-    # Load existing titles
-    if os.path.exists(OUTPUT):
+
+    def is_duplicate(title):
+        return title in existing_titles or store.has_title(title)
+
+    # 转载稿标题往往略有不同，再用正文和 RSS 摘要的 SimHash 做近似去重；
+    # 索引跨多次拉取复用，这里只补上上次以来新写入的文章
+    content_index, summary_index = store.fingerprint_indexes()
+
+    # 全局名额；设置了 per_feed_max 时满额的源后续条目直接跳过
+    feed_counts = {rss: 0 for rss in feeds}
+    full_feeds = set()
+
+    # 增量模式下每个源本轮看到的最新位置，完整处理完才写回新闻库
+    feed_marks = {}
+
+    def newer_entries(rss, entries):
+        last_published, last_guid = store.get_feed_state(rss)
+        stamps = [entry_timestamp(entry) for entry in entries]
+        known = [t for t in stamps if t != float('-inf')]
+        feed_marks[rss] = (
+            max(known) if known else last_published,
+            (entries[0].get('id') or entries[0].get('link')) if entries else last_guid
+        )
+        fresh = []
+        # 条目按从新到旧排列，排在上次第一条之后的都是旧条目
+        passed_last = False
+        for entry, stamp in zip(entries, stamps):
+            if last_guid is not None and (entry.get('id') or entry.get('link')) == last_guid:
+                passed_last = True
+            if stamp != float('-inf'):
+                if last_published is None or stamp > last_published:
+                    fresh.append(entry)
+            elif not passed_last:
+                # 没有发布时间的条目只能按位置判断
+                fresh.append(entry)
+        return fresh
+
+    def check_entry(rss, entry) -> Optional[Dict]:
+        """下载前的过滤，返回要处理的条目；跳过时返回 None"""
+        title = entry.get('title')
+        link = entry.get('link')
+        # RSS 2.0 的 item 只要求 title 和 description 有其一
+        if not title or not link:
+            logging.info(f"Skipping RSS entry without title or link from {rss}")
+            run.count('skipped_invalid')
+            return None
+        # Skip if title already exists
+        if is_duplicate(title) or store.has_url(link, entry.get('id')):
+            logging.info(f"Skipping duplicate article: {title}")
+            run.count('skipped_duplicate')
+            return None
+        # 摘要足够长时，下载前就能认出转载稿
+        summary = dedup.strip_html(entry.get('summary', ''))
+        fingerprint = dedup.simhash(text_to_wordlist(summary)) if summary else None
+        if fingerprint is not None and summary_index.near(fingerprint) is not None:
+            logging.info(f"Skipping near-duplicate summary: {title}")
+            run.count('skipped_near_duplicate')
+            return None
+        return {'rss': rss, 'entry': entry, 'summary_simhash': fingerprint}
+
+    def iter_entries():
+        polled = poll_feeds(feeds, cache, feed_workers)
+        if incremental:
+            polled = [(rss, newer_entries(rss, entries)) for rss, entries in polled]
+        for rss, entry in schedule_entries(polled, feed_order):
+            if rss in full_feeds:
+                continue
+            # 这里是流水线的数据源，一条出错只跳过这一条，不能让整次拉取停下
+            try:
+                item = check_entry(rss, entry)
+            except Exception as e:
+                logging.exception(f"Fail to check RSS entry from {rss}: {e}")
+                run.count('entries_failed')
+                continue
+            if item is not None:
+                yield item
+
+    # 阶段抛出的异常由流水线记录并丢弃这一条，这里只负责计数
+    def fetch_stage(item):
         try:
-            df_old = pd.read_excel(OUTPUT)
-            existing_titles.update(df_old['标题'].tolist())
-        except Exception as e:
-            logging.error(f"读取现有新闻文件失败: {e}")
-    
-    for rss in RSS_URLS:
+            item['html'] = fetch_entry_html(item['entry'], limiter, cache)
+        except Exception:
+            run.count('download_failed')
+            raise
+        return item
+
+    def extract_stage(item):
         try:
-            feed = feedparser.parse(rss)
-            entries = feed.entries
-            new_articles_count = 0
-            
-            for entry in entries:
-                if new_articles_count >= max_articles:
-                    break
-                    
-                try:
-                    # Skip if title already exists
-                    title = entry.title
-                    if title in existing_titles:
-                        logging.info(f"Skipping duplicate article: {title}")
-                        continue
-                        
-                    # 使用newspaper库解析文章
-                    article = Article(entry.link, language='zh', fetch_images=False)
-                    article.download()
-                    article.parse()
-                    
-                    # 提取信息
-                    if not article.text or len(article.text.strip()) < 50:
-                        logging.warning(f"newspaper提取内容不足，使用备用方法: {entry.link}")
-                        fallback_result = extract_metadata_fallback(entry)
-                        if not fallback_result:
-                            continue
-                        
-                        title = fallback_result['title']
-                        content = fallback_result['content']
-                        publish_date = fallback_result['publish_date']
-                    else:
-                        title = article.title or entry.title
-                        content = article.text.strip().replace('\n', ' ')
-                        publish_date = article.publish_date
-                    
-                    # 如果还是提取不到日期，使用RSS中的日期
-                    if not publish_date:
-                        publish_date = extract_date_from_rss(entry)
-                    
-                    # Skip if title already exists (double check)
-                    if title in existing_titles:
-                        logging.info(f"Skipping duplicate article: {title}")
-                        continue
-                    
-                    existing_titles.add(title)
-                    
-                    row_data = {
-                        '时间': publish_date.strftime('%Y-%m-%d %H:%M') if publish_date else datetime.now().strftime('%Y-%m-%d %H:%M'),
-                        '标题': title,
-                        '内容': content,
-                    }
-                    
-                    # 对每个模型进行分类
-                    for model_name, model in models.items():
-                        try:
-                            check_value = check(content, model)
-                            row_data[model_name] = float(f'{check_value:.4f}')
-                        except Exception as e:
-                            logging.error(f"Fail to classify with model {model_name}: {e}")
-                            row_data[model_name] = 0.0
-
-                    rows.append(row_data)
-                    new_articles_count += 1
-                    total_processed += 1
-                    
-                    # Call callbacks with true progress
-                    if progress_callback:
-                        progress_callback(new_articles_count, max_articles)
-                    if news_callback:
-                        news_callback(row_data)
-                        
-                    # 避免请求过于频繁
-                    time.sleep(0.5)
-                        
-                except Exception as e:
-                    logging.exception(f"Fail to process article {entry.link}: {e}")
-                    # 即使失败也添加延迟
-                    time.sleep(0.5)
-        
-        except Exception as e:
-            logging.exception(f"Fail to parse RSS feed {rss}: {e}")
+            result = extract_entry(item['entry'], item.pop('html'))
+        except Exception:
+            run.count('extract_failed')
+            raise
+        if result is None:
+            return None
+        # 已入库的标题不必再分词打分
+        if store.has_title(result['title']):
+            logging.info(f"Skipping duplicate article: {result['title']}")
+            run.count('skipped_duplicate')
+            return None
+        item.update(result)
+        return item
+
+    cpu_pool = None
+    if cpu_workers:
+        # spawn 避免子进程继承父进程的 SQLite 连接和线程
+        cpu_pool = ProcessPoolExecutor(
+            max_workers=cpu_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def run_cpu(func, *args):
+        if cpu_pool is not None:
+            return cpu_pool.submit(func, *args).result()
+        return func(*args)
+
+    def record_timings(item):
+        for name, seconds in item.pop('timings').items():
+            run.observe(name, seconds)
+
+    def fingerprint_stage(item):
+        item.update(run_cpu(fingerprint_content, item['content']))
+        record_timings(item)
+        return item
+
+    def score_stage(item):
+        # 先查近似重复，转载稿不必再打分；入库前在末端还会按顺序再查一次
+        fingerprint = item['simhash']
+        if fingerprint is not None and content_index.near(fingerprint) is not None:
+            logging.info(f"Skipping near-duplicate article: {item['title']}")
+            run.count('skipped_near_duplicate')
+            return None
+        item.update(run_cpu(score_content, item['content'], item.pop('words')))
+        record_timings(item)
+        return item
+
+    pipeline = Pipeline(
+        [
+            Stage('fetch', fetch_stage, workers=workers, queue_size=queue_size),
+            Stage('extract', extract_stage, workers=2, queue_size=queue_size),
+            Stage('fingerprint', fingerprint_stage, workers=max(1, cpu_workers), queue_size=queue_size),
+            Stage('score', score_stage, workers=max(1, cpu_workers), queue_size=queue_size),
+        ],
+        skip=lambda item: item['rss'] in full_feeds,
+        output_size=queue_size,
+        stopped=cancel_event
+    )
+    last_pipeline = pipeline
+    pipeline.start()
+    pipeline.feed(iter_entries())
+    finished = False
 
-    # 如果没有获取到新文章，直接返回
-    if not rows:
-        logging.warning("No new articles fetched.")
-        return pd.DataFrame()
-    
-    df_new = pd.DataFrame(rows)
-    
-    # Update current_news_df and save to Excel
     try:
-        if os.path.exists(OUTPUT):
-            df_old = pd.read_excel(OUTPUT)
-            current_news_df = pd.concat([df_old, df_new])
+        for _, item in pipeline.results():
+            if item is None or item['rss'] in full_feeds:
+                continue
+
+            title = item['title']
+            content = item['content']
+            publish_date = item['publish_date']
+            
+            # Skip if title already exists (double check)
+            if is_duplicate(title):
+                logging.info(f"Skipping duplicate article: {title}")
+                run.count('skipped_duplicate')
+                continue
+
+            # 正文与已有文章近似重复时不入库
+            fingerprint = item['simhash']
+            if fingerprint is not None and content_index.near(fingerprint) is not None:
+                logging.info(f"Skipping near-duplicate article: {title}")
+                run.count('skipped_near_duplicate')
+                continue
+            
+            existing_titles.add(title)
+            summary_fingerprint = item['summary_simhash']
+            if fingerprint is not None:
+                content_index.add(fingerprint)
+            if summary_fingerprint is not None:
+                summary_index.add(summary_fingerprint)
+            
+            row_data = {
+                '时间': publish_date.strftime('%Y-%m-%d %H:%M') if publish_date else datetime.now().strftime('%Y-%m-%d %H:%M'),
+                '标题': title,
+                '内容': content,
+            }
+            
+            # 所有模型的分类结果
+            for model_name in scorer['names']:
+                row_data[model_name] = (item['scores'] or {}).get(model_name, 0.0)
+
+            entry = item['entry']
+            rows.append(row_data)
+            stored.append((row_data, {
+                'url': entry.link,
+                'guid': entry.get('id'),
+                'simhash': fingerprint,
+                'summary_simhash': summary_fingerprint,
+            }))
+            feed_counts[item['rss']] += 1
+            total_processed += 1
+            
+            # Call callbacks with true progress
+            if progress_callback:
+                progress_callback(total_processed, max_articles)
+            if news_callback:
+                news_callback(row_data)
+
+            if total_processed >= max_articles:
+                break
+            if per_feed_max is not None and feed_counts[item['rss']] >= per_feed_max:
+                full_feeds.add(item['rss'])
         else:
-            current_news_df = df_new
+            # 被取消时 results() 会提前结束
+            finished = not pipeline.stopped.is_set()
+            if not finished:
+                logging.info("Fetch cancelled")
+                run.count('cancelled')
+    finally:
+        if not finished:
+            # 名额已满时丢弃还没处理完的条目
+            pipeline.stop()
+        if cpu_pool is not None:
+            cpu_pool.shutdown(wait=finished, cancel_futures=True)
+        # 名额用完时可能还有较新的条目没处理，这些源的进度不前移
+        if incremental and finished:
+            for rss, (last_published, last_guid) in feed_marks.items():
+                if rss not in full_feeds:
+                    store.set_feed_state(rss, last_published, last_guid)
+        for stats in pipeline.stats():
+            logging.info(f"Pipeline stage stats: {stats}")
+        run.pipeline = pipeline.stats()
 
-        # Convert all model columns to float
-        for model_name in models.keys():
-            if model_name in current_news_df.columns:
-                current_news_df[model_name] = current_news_df[model_name].astype(float)
-        
-        # 去重并保存
-        current_news_df = current_news_df.drop_duplicates(subset=['标题'], keep='last')
-        current_news_df.to_excel(OUTPUT, index=False)
-        
-    except Exception as e:
-        logging.exception(f"Fail to save news data: {e}")
-    
-    return current_news_df
+    df_new = pd.DataFrame(rows)
+    if rows:
+        # 只把新文章追加进新闻库，不再重写整个文件
+        try:
+            with metrics.timer('store_write'):
+                run.count('stored', store.add_many(stored))
+        except Exception as e:
+            logging.exception(f"Fail to save news data: {e}")
+    else:
+        logging.warning("No new articles fetched.")
+    finish_metrics(run)
+
+    if not update_current:
+        return df_new
+    # 本轮没有新文章时，后台采集进程也可能写入过
+    synced = sync_current_news()
+    return df_new if synced is None else synced
+
+def finish_metrics(run: metrics.RunMetrics):
+    metrics.finish_run(run)
+    logging.info("Run summary:\n" + run.format_summary())
 
-def get_current_news() -> Optional[pd.DataFrame]:
-    """Get the current news DataFrame"""
-    global current_news_df
-    if current_news_df is None and os.path.exists(OUTPUT):
+def get_store():
+    from news_store import get_store
+    return get_store()
+
+def clear_news():
+    """清空新闻库（覆盖拉取时使用）"""
+    global current_news_df, current_news_id
+    get_store().clear()
+    current_news_df = None
+    current_news_id = 0
+
+def export_news(path: str = OUTPUT):
+    """把新闻库导出为 Excel"""
+    get_store().export_excel(path)
+
+def get_current_news(reload: bool = False) -> Optional[pd.DataFrame]:
+    """Get the current news DataFrame
+
+    reload=True 时重新读取新闻库，以看到后台采集进程写入的新文章。
+    """
+    global current_news_df, current_news_id
+    if current_news_df is None or reload:
         try:
-            current_news_df = pd.read_excel(OUTPUT)
+            store = get_store()
+            if len(store):
+                current_news_df, current_news_id = store.load_since(0)
         except Exception as e:
-            logging.error(f"Failed to load current news from file: {e}")
+            logging.error(f"Failed to load current news from store: {e}")
             return None
     return current_news_df
 
+def sync_current_news() -> Optional[pd.DataFrame]:
+    """把新闻库里比 current_news_df 更新的文章追加进来，包括后台采集进程写入的"""
+    import pandas as pd
+    global current_news_df, current_news_id
+    if current_news_df is None:
+        return get_current_news()
+    new_df, current_news_id = load_news_since(current_news_id)
+    if not new_df.empty:
+        current_news_df = pd.concat([current_news_df, new_df], ignore_index=True)
+    return current_news_df
+
+def load_news_since(since_id: int) -> Tuple[pd.DataFrame, int]:
+    """读出新闻库中 id 大于 since_id 的文章，返回 (表, 最大 id)；调用方自己记住 id"""
+    return get_store().load_since(since_id)
+
 if __name__ == "__main__":
     df = fetch_news(max_articles=50)
     logging.debug(f"Fetched news data:\n{df}")
@@ -0,0 +1,70 @@
+"""无界面的后台采集进程：按固定间隔轮询 RSS_URLS，只处理新条目，打分后写入新闻库
+
+用法: python collector_daemon.py [--interval 秒] [--max-articles N] [--once]
+
+图形界面会定期从新闻库读取新写入的文章（collect_news.load_news_since）。
+"""
+import argparse
+import logging
+import sys
+import time
+
+import collect_news
+
+
+def run_once(max_articles: int, cpu_workers: int) -> int:
+    """执行一轮增量采集，返回新增文章数"""
+    # 期间可能重新训练过模型，每轮都从磁盘重新读取
+    collect_news.update_models()
+    added = 0
+
+    def count(row_data):
+        nonlocal added
+        added += 1
+
+    collect_news.fetch_news(
+        news_callback=count,
+        max_articles=max_articles,
+        incremental=True,
+        cpu_workers=cpu_workers,
+        # 后台进程从不读取整张新闻表，不必把它留在内存里
+        update_current=False
+    )
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后台新闻采集")
+    parser.add_argument("--interval", type=float, default=600, help="两轮采集之间的间隔（秒），默认 600")
+    parser.add_argument("--max-articles", type=int, default=100, help="每轮最多新增的文章数")
+    parser.add_argument("--cpu-workers", type=int, default=2, help="分词打分使用的进程数，0 表示不用子进程")
+    parser.add_argument("--once", action="store_true", help="只采集一轮就退出")
+    args = parser.parse_args()
+
+    # 除了 news_fetcher.log，也把 INFO 以上的日志打到终端
+    console = logging.StreamHandler(sys.stderr)
+    console.setLevel(logging.INFO)
+    console.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logging.getLogger().addHandler(console)
+
+    while True:
+        started = time.monotonic()
+        try:
+            added = run_once(args.max_articles, args.cpu_workers)
+            logging.info(f"本轮新增 {added} 篇，耗时 {time.monotonic() - started:.1f} 秒")
+        except Exception as e:
+            logging.exception(f"采集失败: {e}")
+
+        if args.once:
+            break
+        try:
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            break
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,82 @@
+import hashlib
+import html
+import re
+from typing import Dict, Iterable, List, Optional
+
+# 汉明距离不超过这个值就认为是同一篇稿件
+MAX_DISTANCE = 3
+# 有效词少于这个数时指纹不可靠，不做近似去重
+MIN_TOKENS = 20
+
+BITS = 64
+# 分成 MAX_DISTANCE + 1 段：距离不超过 MAX_DISTANCE 的两个指纹至少有一段完全相同
+BANDS = MAX_DISTANCE + 1
+BAND_BITS = BITS // BANDS
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(tokens: Iterable[str]) -> Optional[int]:
+    """由分词结果计算 64 位 SimHash；有效词太少时返回 None"""
+    words = [w for w in tokens if any(ch.isalnum() for ch in w)]
+    if len(words) < MIN_TOKENS:
+        return None
+    weights = [0] * BITS
+    for word in words:
+        h = _token_hash(word)
+        for bit in range(BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    fingerprint = 0
+    for bit in range(BITS):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def strip_html(text: str) -> str:
+    """RSS 摘要里常带 HTML 标签"""
+    return html.unescape(re.sub(r'<[^>]+>', ' ', text or '')).strip()
+
+
+def to_signed(fingerprint: int) -> int:
+    """SQLite 的 INTEGER 是有符号 64 位"""
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << BITS) if value < 0 else value
+
+
+class SimHashIndex:
+    """按段分桶的 SimHash 索引，查询只比较至少有一段相同的候选"""
+
+    def __init__(self, fingerprints: Iterable[int] = ()):
+        self.buckets: Dict[tuple, List[int]] = {}
+        for fingerprint in fingerprints:
+            self.add(fingerprint)
+
+    def _bands(self, fingerprint: int):
+        mask = (1 << BAND_BITS) - 1
+        for band in range(BANDS):
+            yield band, fingerprint >> (band * BAND_BITS) & mask
+
+    def add(self, fingerprint: int):
+        """同一个指纹重复加入时忽略"""
+        keys = list(self._bands(fingerprint))
+        if fingerprint in self.buckets.get(keys[0], ()):
+            return
+        for key in keys:
+            self.buckets.setdefault(key, []).append(fingerprint)
+
+    def near(self, fingerprint: int) -> Optional[int]:
+        """返回一个距离不超过 MAX_DISTANCE 的已有指纹，没有则返回 None"""
+        for key in self._bands(fingerprint):
+            for other in self.buckets.get(key, ()):
+                if bin(fingerprint ^ other).count('1') <= MAX_DISTANCE:
+                    return other
+        return None
+
+    def __len__(self):
+        return sum(len(v) for v in self.buckets.values()) // BANDS
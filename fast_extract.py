@@ -0,0 +1,153 @@
+"""基于 lxml 的快速正文提取，结果与 collect_news.extract_content_with_bs 一致
+
+所有选择器合并成一条预编译的 XPath，在 C 里一次遍历拿到全部候选元素，
+再在 Python 里按选择器优先级挑选，不再每个选择器各遍历一遍文档。
+"""
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 与 BeautifulSoup 版本相同的选择器，顺序即优先级
+DATE_SELECTORS = [
+    '.publish-time', '.article-time', '.date', '.pubtime',
+    'time[datetime]', 'span[class*="date"]', 'span[class*="time"]',
+    'meta[property="article:published_time"]', 'meta[name="publishdate"]'
+]
+CONTENT_SELECTORS = [
+    'article', '.article-content', '.content', '.post-content',
+    '.entry-content', 'main', '#content', '.news-content', '.text'
+]
+TITLE_SELECTORS = [
+    'h1', '.title', '.article-title', '.post-title', '.entry-title',
+    'meta[property="og:title"]', 'title'
+]
+REMOVED_TAGS = ['script', 'style', 'nav', 'footer', 'header', 'aside', 'advertisement']
+
+# 只支持上面用到的简单选择器：标签、.类名、#id、[属性]、[属性="值"]、[属性*="值"]
+_SELECTOR = re.compile(
+    r'^(?P<tag>[\w-]*)(?:\.(?P<cls>[\w-]+))?(?:#(?P<id>[\w-]+))?'
+    r'(?:\[(?P<attr>[\w:-]+)(?:(?P<op>\*?=)"(?P<value>[^"]*)")?\])?$'
+)
+
+_compiled = None
+
+
+def _predicate(selector: str) -> Callable:
+    """把选择器编译成判断单个元素是否匹配的函数"""
+    m = _SELECTOR.match(selector)
+    if not m:
+        raise ValueError(f"Unsupported selector: {selector}")
+    tag, cls, id_, attr, op, value = m.group('tag', 'cls', 'id', 'attr', 'op', 'value')
+
+    def match(el) -> bool:
+        if tag and el.tag != tag:
+            return False
+        if cls and cls not in (el.get('class') or '').split():
+            return False
+        if id_ and el.get('id') != id_:
+            return False
+        if attr:
+            actual = el.get(attr)
+            if actual is None:
+                return False
+            if op == '=' and actual != value:
+                return False
+            if op == '*=' and value not in actual:
+                return False
+        return True
+
+    return match
+
+
+def _compile():
+    """首次使用时编译：一条合并后的 XPath + 每个选择器的判断函数"""
+    global _compiled
+    if _compiled is None:
+        from lxml import etree
+        from lxml.cssselect import CSSSelector
+        groups = {
+            'date': DATE_SELECTORS,
+            'content': CONTENT_SELECTORS,
+            'title': TITLE_SELECTORS,
+        }
+        all_selectors = [s for selectors in groups.values() for s in selectors]
+        union = etree.XPath(' | '.join(CSSSelector(s).path for s in dict.fromkeys(all_selectors)))
+        predicates = {
+            name: [(s, _predicate(s)) for s in selectors]
+            for name, selectors in groups.items()
+        }
+        _compiled = (union, predicates, etree.XPath('string()'))
+    return _compiled
+
+
+def clean_text(text: str) -> str:
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+def _first_matches(candidates, predicates) -> Dict[str, List[Tuple[str, Optional[object]]]]:
+    """对每组选择器，找出每个选择器在文档顺序中的第一个匹配元素"""
+    found = {}
+    for name, selectors in predicates.items():
+        first = [None] * len(selectors)
+        remaining = len(selectors)
+        for el in candidates:
+            for i, (_, match) in enumerate(selectors):
+                if first[i] is None and match(el):
+                    first[i] = el
+                    remaining -= 1
+            if not remaining:
+                break
+        found[name] = [(s, el) for (s, _), el in zip(selectors, first)]
+    return found
+
+
+def extract_content(html_content: str, url: str, parse_date: Callable[[str], object]) -> Optional[Dict]:
+    """返回 {'title', 'content', 'publish_date'}；parse_date 把日期文本解析成 datetime"""
+    import lxml.html
+    from lxml import etree
+
+    union, predicates, string_value = _compile()
+    if not html_content or not html_content.strip():
+        return None
+    root = lxml.html.fromstring(html_content)
+    etree.strip_elements(root, *REMOVED_TAGS, with_tail=False)
+
+    found = _first_matches(union(root), predicates)
+
+    def text_of(el) -> str:
+        return str(string_value(el))
+
+    publish_date = None
+    for selector, el in found['date']:
+        if el is None:
+            continue
+        date_str = el.get('content', '') if selector.startswith('meta') else text_of(el).strip()
+        publish_date = parse_date(date_str)
+        if publish_date:
+            break
+
+    content = None
+    for selector, el in found['content']:
+        if el is None:
+            continue
+        content = clean_text(text_of(el))
+        if len(content) > 100:  # 确保内容足够长
+            break
+    if not content:
+        # 如果特定选择器没找到，使用全文
+        content = clean_text(text_of(root))
+
+    title = None
+    for selector, el in found['title']:
+        if el is None:
+            continue
+        title = el.get('content', '') if selector.startswith('meta') else text_of(el).strip()
+        if title:
+            break
+
+    return {
+        'title': title,
+        'content': content,
+        'publish_date': publish_date
+    }
@@ -0,0 +1,150 @@
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import metrics
+
+# requests 比较重，第一次发请求时才导入
+_session = None
+_lock = threading.Lock()
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+# 每个站点保持的长连接数，应不小于并发下载数
+POOL_SIZE = 16
+
+
+def get_session():
+    """整个进程共用一个带连接池的 Session，复用 keep-alive 连接和 TLS 握手"""
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+    return _session
+
+
+def decode_response(response) -> str:
+    """响应头声明了字符集就直接用，否则再去猜编码"""
+    if 'charset' not in response.headers.get('Content-Type', '').lower():
+        response.encoding = response.apparent_encoding
+    return response.text
+
+
+def fetch_html(url: str, timeout: float = 10) -> str:
+    """下载网页并返回解码后的 HTML"""
+    response = get_session().get(url, timeout=timeout)
+    response.raise_for_status()
+    metrics.count('bytes_downloaded', len(response.content))
+    return decode_response(response)
+
+
+# 磁盘缓存：RSS 记录 ETag/Last-Modified 做条件请求，正文页按 GUID/URL 缓存
+CACHE_PATH = 'http_cache.sqlite'
+# 正文页缓存保留的天数
+PAGE_TTL_DAYS = 30
+
+_cache = None
+
+
+class HttpCache:
+    """SQLite 实现的 HTTP 缓存，可以在多个下载线程之间共用"""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS feeds (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    html TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS pages_url ON pages (url);
+            ''')
+            self.conn.execute(
+                'DELETE FROM pages WHERE fetched_at < ?',
+                (time.time() - PAGE_TTL_DAYS * 86400,)
+            )
+            self.conn.commit()
+
+    def get_feed(self, url: str):
+        with self.lock:
+            return self.conn.execute(
+                'SELECT etag, last_modified, body FROM feeds WHERE url = ?', (url,)
+            ).fetchone()
+
+    def put_feed(self, url: str, etag, last_modified, body: bytes):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO feeds (url, etag, last_modified, body) VALUES (?, ?, ?, ?)',
+                (url, etag, last_modified, body)
+            )
+            self.conn.commit()
+
+    def get_page(self, key: str, url: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT html FROM pages WHERE key = ? OR url = ? LIMIT 1', (key, url)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_page(self, key: str, url: str, html: str):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO pages (key, url, html, fetched_at) VALUES (?, ?, ?, ?)',
+                (key, url, html, time.time())
+            )
+            self.conn.commit()
+
+
+def get_cache() -> HttpCache:
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = HttpCache()
+    return _cache
+
+
+def fetch_feed(url: str, cache: Optional[HttpCache] = None, timeout: float = 10) -> bytes:
+    """下载 RSS 原文；有缓存时带上 ETag/Last-Modified，304 时直接返回缓存内容"""
+    headers = {}
+    cached = cache.get_feed(url) if cache else None
+    if cached:
+        etag, last_modified, body = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    response = get_session().get(url, timeout=timeout, headers=headers)
+    if cached and response.status_code == 304:
+        metrics.count('feeds_not_modified')
+        return cached[2]
+    response.raise_for_status()
+    metrics.count('bytes_downloaded', len(response.content))
+    if cache:
+        cache.put_feed(
+            url,
+            response.headers.get('ETag'),
+            response.headers.get('Last-Modified'),
+            response.content
+        )
+    return response.content
@@ -0,0 +1,148 @@
+"""采集过程的计时和计数
+
+fetch_news 开始时 start_run()，各环节用 timer()/count() 记录到当前这一轮，
+结束时 finish_run() 把汇总追加到 METRICS_PATH（每轮一行 JSON）。
+没有进行中的一轮时 timer()/count() 什么也不做。
+"""
+import bisect
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# 每轮的汇总追加到这里；设为 None 不写文件
+METRICS_PATH = 'collector_metrics.jsonl'
+
+# 直方图各桶的上界（毫秒），最后一个桶收集更慢的
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+class Histogram:
+    def __init__(self):
+        self.samples: List[float] = []
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+
+    def percentile(self, ordered: List[float], q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+        ms = lambda seconds: round(seconds * 1000, 2)
+        return {
+            'count': len(ordered),
+            'total_ms': ms(sum(ordered)),
+            'mean_ms': ms(sum(ordered) / len(ordered)),
+            'p50_ms': ms(self.percentile(ordered, 0.5)),
+            'p90_ms': ms(self.percentile(ordered, 0.9)),
+            'p99_ms': ms(self.percentile(ordered, 0.99)),
+            'max_ms': ms(ordered[-1]),
+            # 键是桶的上界，"+Inf" 为最后一个桶
+            'buckets': {
+                str(bound): n
+                for bound, n in zip(BUCKETS_MS + ['+Inf'], self.buckets) if n
+            },
+        }
+
+
+class RunMetrics:
+    """一轮采集的各环节耗时直方图和计数，可以在多个线程里同时记录"""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.seconds: Optional[float] = None
+        self.timings: Dict[str, Histogram] = {}
+        self.counts: Dict[str, int] = {}
+        self.pipeline: List[dict] = []
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float):
+        with self.lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def summary(self) -> dict:
+        with self.lock:
+            seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.started
+            return {
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'seconds': round(seconds, 3),
+                'counts': dict(sorted(self.counts.items())),
+                'timings': {name: h.summary() for name, h in self.timings.items()},
+                'pipeline': self.pipeline,
+            }
+
+    def format_summary(self) -> str:
+        """给人看的多行汇总"""
+        summary = self.summary()
+        counts = summary['counts']
+        lines = [
+            f"采集耗时 {summary['seconds']:.2f} 秒，下载 {counts.get('bytes_downloaded', 0) / 1024:.0f} KB",
+            "计数: " + "，".join(f"{k} {v}" for k, v in counts.items() if k != 'bytes_downloaded'),
+        ]
+        for name, t in sorted(summary['timings'].items(), key=lambda kv: -kv[1]['total_ms']):
+            lines.append(
+                f"  {name:<20} {t['count']:>6} 次  合计 {t['total_ms']:>10.1f} ms"
+                f"  p50 {t['p50_ms']:>8.1f}  p90 {t['p90_ms']:>8.1f}  max {t['max_ms']:>8.1f}"
+            )
+        return '\n'.join(lines)
+
+
+_active: Optional[RunMetrics] = None
+
+
+def start_run() -> RunMetrics:
+    global _active
+    _active = RunMetrics()
+    return _active
+
+
+def finish_run(run: RunMetrics, path: Optional[str] = None):
+    """结束这一轮并把汇总追加到 path（默认 METRICS_PATH）"""
+    global _active
+    if _active is run:
+        _active = None
+    run.seconds = time.perf_counter() - run.started
+    path = path or METRICS_PATH
+    if path:
+        try:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(run.summary(), ensure_ascii=False) + '\n')
+        except OSError as e:
+            logging.error(f"Fail to write metrics: {e}")
+
+
+def current() -> Optional[RunMetrics]:
+    return _active
+
+
+@contextmanager
+def timer(name: str):
+    run = _active
+    if run is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.observe(name, time.perf_counter() - started)
+
+
+def count(name: str, n: int = 1):
+    run = _active
+    if run is not None:
+        run.count(name, n)
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 新闻库位置；news.xlsx 只作为导出格式
+DB_PATH = 'news.sqlite'
+# 第一次打开新闻库时从这里导入历史数据
+LEGACY_EXCEL = 'news.xlsx'
+
+# 与 DataFrame 中文列名对应的数据库字段
+COLUMNS = [('时间', 'published'), ('标题', 'title'), ('内容', 'content')]
+
+
+class NewsStore:
+    """SQLite 新闻库：标题、链接、发布时间都有索引，追加和去重只和新文章数量有关
+
+    意向分数单独存成 (文章, 意向, 分数) 一行，新增意向或重打分不需要改表结构。
+    """
+
+    def __init__(self, path: str = DB_PATH, legacy_excel: Optional[str] = LEGACY_EXCEL):
+        fresh = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        # 近似去重索引，见 fingerprint_indexes
+        self.index_lock = threading.Lock()
+        self.indexes = None
+        self.indexed_id = 0
+        with self.lock:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS articles (
+                    id INTEGER PRIMARY KEY,
+                    published TEXT NOT NULL,
+                    title TEXT NOT NULL UNIQUE,
+                    content TEXT NOT NULL,
+                    url TEXT,
+                    guid TEXT,
+                    simhash INTEGER,
+                    summary_simhash INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS articles_url ON articles (url);
+                CREATE INDEX IF NOT EXISTS articles_guid ON articles (guid);
+                CREATE INDEX IF NOT EXISTS articles_published ON articles (published);
+                CREATE TABLE IF NOT EXISTS feed_state (
+                    url TEXT PRIMARY KEY,
+                    last_published REAL,
+                    last_guid TEXT
+                );
+                CREATE TABLE IF NOT EXISTS scores (
+                    article_id INTEGER NOT NULL REFERENCES articles (id) ON DELETE CASCADE,
+                    intent TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (article_id, intent)
+                );
+                CREATE TABLE IF NOT EXISTS model_versions (
+                    intent TEXT PRIMARY KEY,
+                    version TEXT NOT NULL
+                );
+            ''')
+            self.conn.execute('PRAGMA foreign_keys = ON')
+            self._ensure_columns('articles', {'simhash': 'INTEGER', 'summary_simhash': 'INTEGER'})
+        if fresh and legacy_excel and os.path.exists(legacy_excel):
+            self.import_excel(legacy_excel)
+
+    def _ensure_columns(self, table: str, columns: Dict[str, str]):
+        """给旧版本建的库补上后来新增的列"""
+        existing = {r[1] for r in self.conn.execute(f'PRAGMA table_info({table})')}
+        for name, kind in columns.items():
+            if name not in existing:
+                self.conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {kind}')
+        self.conn.commit()
+
+    # ----------------------------------------------------------
+    # 去重查询
+    # ----------------------------------------------------------
+    def has_title(self, title: str) -> bool:
+        with self.lock:
+            return self.conn.execute(
+                'SELECT 1 FROM articles WHERE title = ?', (title,)
+            ).fetchone() is not None
+
+    def has_url(self, url: str, guid: Optional[str] = None) -> bool:
+        with self.lock:
+            return self.conn.execute(
+                'SELECT 1 FROM articles WHERE url = ? OR guid = ?', (url, guid or url)
+            ).fetchone() is not None
+
+    def fingerprint_indexes(self):
+        """返回 (正文指纹索引, RSS 摘要指纹索引)，用于近似去重
+
+        索引第一次调用时建好并留在库对象上，之后每次只按主键补上 id 更大的文章
+        （包括其他进程写入的），拉取的开销不再随新闻库增长。调用方往索引里加的
+        指纹之后再被补进来也不会重复。旧文章没有正文指纹时顺便补算一次；
+        0 表示文本太短、没有指纹。
+        """
+        import dedup
+        import token_cache
+        with self.index_lock:
+            if self.indexes is None:
+                self.indexes = (dedup.SimHashIndex(), dedup.SimHashIndex())
+                self.indexed_id = 0
+            with self.lock:
+                missing = self.conn.execute(
+                    'SELECT id, content FROM articles WHERE id > ? AND simhash IS NULL',
+                    (self.indexed_id,)
+                ).fetchall()
+            if missing:
+                updates = []
+                for article_id, content in missing:
+                    fingerprint = dedup.simhash(token_cache.tokenize(content))
+                    updates.append((dedup.to_signed(fingerprint) if fingerprint else 0, article_id))
+                with self.lock, self.conn:
+                    self.conn.executemany('UPDATE articles SET simhash = ? WHERE id = ?', updates)
+            with self.lock:
+                rows = self.conn.execute(
+                    'SELECT id, simhash, summary_simhash FROM articles WHERE id > ? ORDER BY id',
+                    (self.indexed_id,)
+                ).fetchall()
+            content_index, summary_index = self.indexes
+            for _, content, summary in rows:
+                if content:
+                    content_index.add(dedup.to_unsigned(content))
+                if summary:
+                    summary_index.add(dedup.to_unsigned(summary))
+            if rows:
+                self.indexed_id = rows[-1][0]
+            return self.indexes
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # ----------------------------------------------------------
+    # 增量拉取进度
+    # ----------------------------------------------------------
+    def get_feed_state(self, url: str) -> Tuple[Optional[float], Optional[str]]:
+        """返回该源上次完整处理到的 (最新发布时间戳, 最新条目 GUID)"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT last_published, last_guid FROM feed_state WHERE url = ?', (url,)
+            ).fetchone()
+        return row if row else (None, None)
+
+    def set_feed_state(self, url: str, last_published: Optional[float], last_guid: Optional[str]):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO feed_state (url, last_published, last_guid) VALUES (?, ?, ?)',
+                (url, last_published, last_guid)
+            )
+
+    # ----------------------------------------------------------
+    # 写入
+    # ----------------------------------------------------------
+    def add_many(self, items: Iterable[Tuple[Dict, Dict]]) -> int:
+        """追加 (row_data, meta)；row_data 与 fetch_news 产生的行格式相同
+
+        meta 可以包含 url、guid、simhash、summary_simhash。
+        标题已存在的行会被忽略，返回实际写入的条数。
+        """
+        import dedup
+        added = 0
+        with self.lock, self.conn:
+            for row_data, meta in items:
+                fingerprints = [
+                    dedup.to_signed(meta[key]) if meta.get(key) else None
+                    for key in ('simhash', 'summary_simhash')
+                ]
+                cursor = self.conn.execute(
+                    'INSERT OR IGNORE INTO articles '
+                    '(published, title, content, url, guid, simhash, summary_simhash) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (row_data['时间'], row_data['标题'], row_data['内容'],
+                     meta.get('url'), meta.get('guid'), *fingerprints)
+                )
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO scores (article_id, intent, score) VALUES (?, ?, ?)',
+                    [
+                        (cursor.lastrowid, intent, float(score))
+                        for intent, score in _intent_items(row_data)
+                    ]
+                )
+        return added
+
+    def write_scores(self, scores: Iterable[Tuple[int, str, float]]):
+        """写入 (文章 id, 意向, 分数)，已有的分数被覆盖"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO scores (article_id, intent, score) VALUES (?, ?, ?)', scores
+            )
+
+    # ----------------------------------------------------------
+    # 重打分
+    # ----------------------------------------------------------
+    def model_versions(self) -> Dict[str, str]:
+        """各意向的历史分数是用哪个版本的模型算出来的"""
+        with self.lock:
+            return dict(self.conn.execute('SELECT intent, version FROM model_versions'))
+
+    def set_model_version(self, intent: str, version: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO model_versions (intent, version) VALUES (?, ?)', (intent, version)
+            )
+
+    def article_batches(self, batch_size: int = 500):
+        """按 id 顺序分批产出 [(id, 内容), ...]，每批单独查询，不必一次读入全部正文"""
+        last_id = 0
+        while True:
+            with self.lock:
+                batch = self.conn.execute(
+                    'SELECT id, content FROM articles WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)
+                ).fetchall()
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1][0]
+
+    def clear(self):
+        with self.index_lock:
+            with self.lock, self.conn:
+                self.conn.execute('DELETE FROM scores')
+                self.conn.execute('DELETE FROM articles')
+                self.conn.execute('DELETE FROM feed_state')
+            self.indexes = None
+
+    # ----------------------------------------------------------
+    # 读取
+    # ----------------------------------------------------------
+    def intents(self) -> List[str]:
+        """按首次出现的顺序返回所有意向"""
+        with self.lock:
+            return [
+                r[0] for r in self.conn.execute(
+                    'SELECT intent FROM scores GROUP BY intent ORDER BY MIN(rowid)'
+                )
+            ]
+
+    def load_dataframe(self) -> pd.DataFrame:
+        """读出与原 news.xlsx 相同布局的表：时间、标题、内容，然后是各意向分数"""
+        return self.load_since(0)[0]
+
+    def load_since(self, since_id: int = 0) -> Tuple[pd.DataFrame, int]:
+        """只读出 id 大于 since_id 的文章，返回 (表, 读到的最大 id)
+
+        按主键范围查询，调用方记住返回的 id，下次只读之后写入的文章（包括其他
+        进程写入的）。没有新文章时返回空表和原来的 since_id。
+        """
+        import pandas as pd
+        with self.lock:
+            articles = pd.read_sql_query(
+                'SELECT id, published, title, content FROM articles WHERE id > ? ORDER BY id',
+                self.conn, params=(since_id,)
+            )
+            scores = pd.read_sql_query(
+                'SELECT article_id, intent, score FROM scores WHERE article_id > ? ORDER BY rowid',
+                self.conn, params=(since_id,)
+            )
+        last_id = int(articles['id'].iloc[-1]) if len(articles) else since_id
+        df = articles.rename(columns={db: zh for zh, db in COLUMNS}).set_index('id')
+        if not scores.empty:
+            # 意向按首次出现的顺序排列，与 intents() 一致
+            wide = scores.pivot(index='article_id', columns='intent', values='score')
+            df = df.join(wide[list(pd.unique(scores['intent']))])
+        return df.reset_index(drop=True), last_id
+
+    # ----------------------------------------------------------
+    # Excel 导入导出
+    # ----------------------------------------------------------
+    def import_excel(self, path: str) -> int:
+        import pandas as pd
+        df = pd.read_excel(path)
+        rows = [
+            {k: v for k, v in row.items() if not _is_missing(v)}
+            for row in df.to_dict('records')
+        ]
+        for row in rows:
+            row['时间'] = str(row.get('时间', ''))
+            row['内容'] = str(row.get('内容', ''))
+        return self.add_many((row, {}) for row in rows if '标题' in row)
+
+    def export_excel(self, path: str = LEGACY_EXCEL):
+        self.load_dataframe().to_excel(path, index=False)
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _intent_items(row_data: Dict):
+    for key, value in row_data.items():
+        if key in ('时间', '标题', '内容'):
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield key, value
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> NewsStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NewsStore()
+    return _store
+
+
+def use_store(store: Optional[NewsStore]) -> Optional[NewsStore]:
+    """替换进程共用的新闻库（录制/回放时换成临时库），返回原来的库"""
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="新闻库工具")
+    parser.add_argument("--export", metavar="XLSX", help="把新闻库导出为 Excel")
+    args = parser.parse_args()
+    if args.export:
+        get_store().export_excel(args.export)
+        print(f"已导出 {len(get_store())} 条新闻到 {args.export}")
+    else:
+        print(f"新闻库 {DB_PATH} 共 {len(get_store())} 条新闻")
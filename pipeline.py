@@ -0,0 +1,171 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+# 队列结束标记
+_DONE = object()
+
+
+class Stage:
+    """流水线的一个阶段：workers 个线程从有界队列取数据，func 的返回值交给下一阶段
+
+    func 返回 None 表示这条数据到此为止（失败或被过滤），但序号仍会继续往下传，
+    这样末端可以按原顺序重排而不会卡住。
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, queue_size: int = 16):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.inbox: queue.Queue = queue.Queue(queue_size)
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+        self.alive = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'stage': self.name,
+                'workers': self.workers,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'busy_seconds': round(self.busy, 3),
+                # 忙碌时间折算成每秒能处理多少条
+                'throughput': round(self.processed / self.busy * self.workers, 2) if self.busy else None,
+                'backlog': self.inbox.qsize(),
+            }
+
+
+class Pipeline:
+    """用有界队列把各阶段串起来：慢的阶段会让上游阻塞，而不是无限堆积
+
+    数据以 (序号, payload) 流动；results() 按序号顺序产出最后一个阶段的结果。
+    传入的 stopped 事件可以从其他线程设置，效果和 stop() 相同（用于取消）。
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        skip: Optional[Callable[[Any], bool]] = None,
+        output_size: int = 16,
+        stopped: Optional[threading.Event] = None
+    ):
+        self.stages = stages
+        self.skip = skip
+        self.output: queue.Queue = queue.Queue(output_size)
+        self.stopped = stopped or threading.Event()
+        self.draining = False
+        self.threads: List[threading.Thread] = []
+
+    def _next_queue(self, index: int) -> queue.Queue:
+        return self.stages[index + 1].inbox if index + 1 < len(self.stages) else self.output
+
+    def _run_stage(self, index: int):
+        stage = self.stages[index]
+        downstream = self._next_queue(index)
+        while True:
+            item = stage.inbox.get()
+            if item is _DONE:
+                break
+            seq, payload = item
+            if payload is not None and not self.stopped.is_set() and not (self.skip and self.skip(payload)):
+                started = time.perf_counter()
+                try:
+                    payload = stage.func(payload)
+                except Exception as e:
+                    logging.exception(f"Pipeline stage {stage.name} failed: {e}")
+                    payload = None
+                    with stage.lock:
+                        stage.failed += 1
+                with stage.lock:
+                    stage.busy += time.perf_counter() - started
+                    stage.processed += 1
+                    if payload is None:
+                        stage.dropped += 1
+            else:
+                payload = None
+            downstream.put((seq, payload))
+
+        # 最后一个退出的线程负责通知下游
+        with stage.lock:
+            stage.alive -= 1
+            last = stage.alive == 0
+        if last:
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    downstream.put(_DONE)
+            else:
+                downstream.put(_DONE)
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            stage.alive = stage.workers
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._run_stage, args=(index,), name=f"{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def feed(self, payloads: Iterable[Any]):
+        """在后台线程里把 payloads 依次送入第一个阶段，送完后关闭流水线"""
+        def run():
+            seq = 0
+            try:
+                for payload in payloads:
+                    if self.stopped.is_set():
+                        break
+                    self.stages[0].inbox.put((seq, payload))
+                    seq += 1
+            except Exception as e:
+                logging.exception(f"Pipeline source failed: {e}")
+            finally:
+                for _ in range(self.stages[0].workers):
+                    self.stages[0].inbox.put(_DONE)
+
+        thread = threading.Thread(target=run, name="source", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def results(self) -> Iterator[Tuple[int, Any]]:
+        """按序号顺序产出 (序号, 结果)；被丢弃的数据结果为 None
+
+        流水线被停止后不再等待剩下的结果，调用方应随后调用 stop() 排空。
+        """
+        waiting = {}
+        expected = 0
+        while True:
+            try:
+                item = self.output.get(timeout=0.2)
+            except queue.Empty:
+                if self.stopped.is_set():
+                    break
+                continue
+            if item is _DONE:
+                break
+            waiting[item[0]] = item[1]
+            while expected in waiting:
+                yield expected, waiting.pop(expected)
+                expected += 1
+
+    def stop(self):
+        """不再处理新数据；剩下的在后台排空，调用方无需等待进行中的请求"""
+        self.stopped.set()
+        if self.draining:
+            return
+        self.draining = True
+
+        def drain():
+            while self.output.get() is not _DONE:
+                pass
+
+        threading.Thread(target=drain, name="drain", daemon=True).start()
+
+    def stats(self) -> List[dict]:
+        return [stage.stats() for stage in self.stages]
@@ -1,13 +1,44 @@
 # main.py
 import flet as ft
+import numpy as np
 import pandas as pd
 import os
 import logging
+import math
+import threading
+import time
 from typing import Dict, List, Tuple, Optional
 
+from aggregates import IntentAggregates
+
 NEWS_COLLECT_SCRIPT = "collect_news.py"
 PREDICT_SCRIPT      = "predict.py"
 
+# 新闻列表每次追加的卡片数，滚动到距底部 LOAD_MORE_PX 像素以内时再追加一页
+PAGE_SIZE    = 50
+LOAD_MORE_PX = 600
+# 拉取过程中刷新新闻列表的最小间隔（秒）
+FLUSH_INTERVAL = 0.5
+# 每隔多久从新闻库读取一次后台采集进程写入的新文章（秒）
+RELOAD_INTERVAL = 30
+
+# 预测只看最近多久的新闻、近期新闻的权重多久减半（秒），None 表示不限
+HOUR = 3600
+WINDOWS = {
+    "全部":    None,
+    "24 小时": 24 * HOUR,
+    "3 天":    3 * 24 * HOUR,
+    "7 天":    7 * 24 * HOUR,
+    "30 天":   30 * 24 * HOUR,
+}
+HALF_LIVES = {
+    "不衰减":  None,
+    "6 小时":  6 * HOUR,
+    "1 天":    24 * HOUR,
+    "3 天":    3 * 24 * HOUR,
+    "7 天":    7 * 24 * HOUR,
+}
+
 logging.basicConfig(
     level=logging.DEBUG,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -29,9 +60,25 @@ def main(page: ft.Page):
     intent_columns: List[str] = []       # 所有意向列名
     selected_intent: Optional[str] = None # 当前选中的意向
 
-    # 左右两栏 ListView
-    lv_left  = ft.ListView(expand=True, spacing=10, padding=10)
-    lv_right = ft.ListView(expand=True, spacing=10, padding=10)
+    # 左右两栏 ListView：只渲染已经滚动到的部分，见 show_news
+    lv_left  = ft.ListView(expand=True, spacing=10, padding=10, on_scroll_interval=100,
+                           on_scroll=lambda e: on_list_scroll(e, left=True))
+    lv_right = ft.ListView(expand=True, spacing=10, padding=10, on_scroll_interval=100,
+                           on_scroll=lambda e: on_list_scroll(e, left=False))
+
+    # 各意向排好序的行位置 {意向: (左栏, 右栏)}，news_df 换了就作废
+    order_cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+    order_source: Optional[pd.DataFrame] = None
+    # 各意向分数的增量汇总，news_df 整个换掉时重建，追加行时只合并新行
+    intent_stats: Optional[IntentAggregates] = None
+    stats_source: Optional[pd.DataFrame] = None
+    # 两栏当前意向下要显示的全部行位置
+    list_rows: Dict[bool, np.ndarray] = {True: np.empty(0, dtype=int), False: np.empty(0, dtype=int)}
+    # news_df 已包含的新闻库文章的最大 id，定期从这之后读取新文章
+    store_cursor = 0
+    # 拉取、定时读取新闻库在后台线程里修改上面这些状态和两栏卡片，
+    # 与切换意向、滚动等界面回调互斥；可重入，加锁的函数之间可以互相调用
+    ui_lock = threading.RLock()
 
     # 进度条、状态文字
     pb_pull    = ft.ProgressBar(width=400, visible=False)
@@ -50,7 +97,7 @@ def main(page: ft.Page):
     # 启动即加载
     # ----------------------------------------------------------
     def load_excel_on_start():
-        nonlocal news_df, intent_columns, selected_intent
+        nonlocal news_df, intent_columns, selected_intent, store_cursor
         try:
             import collect_news
         except ImportError:
@@ -64,6 +111,7 @@ def main(page: ft.Page):
 
         try:
             news_df = collect_news.get_current_news()
+            store_cursor = collect_news.current_news_id
             if news_df is not None:
                 # 自动识别意向列：除前三列外的所有数值列
                 intent_columns = [
@@ -91,18 +139,23 @@ def main(page: ft.Page):
     # 拉取新闻
     # ----------------------------------------------------------
     def pull_news(e, force_refresh: bool = False):
-        nonlocal news_df, intent_columns, selected_intent
+        run_job("拉取新闻", lambda cancel_event: do_pull(cancel_event, force_refresh))
+
+    def do_pull(cancel_event: threading.Event, force_refresh: bool):
+        nonlocal news_df, intent_columns, selected_intent, store_cursor
+        pb_pull.value = None
         pb_pull.visible = True
         
         # Handle force refresh
         if force_refresh:
             try:
-                import os
-                if os.path.exists('news.xlsx'):
-                    os.remove('news.xlsx')
-                news_df = None
-                intent_columns = []
-                selected_intent = None
+                import collect_news
+                collect_news.clear_news()
+                with ui_lock:
+                    news_df = None
+                    store_cursor = 0
+                    intent_columns = []
+                    selected_intent = None
                 lbl_status.value = "正在重新拉取新闻..."
             except Exception as ex:
                 lbl_status.value = f"清除历史数据失败：{ex}"
@@ -120,13 +173,29 @@ def main(page: ft.Page):
             seen_titles.update(news_df['标题'].tolist())
         total_new = 0
 
+        # 新文章先攒起来，每 FLUSH_INTERVAL 秒最多刷新一次界面
+        pending_rows: List[Dict] = []
+        last_flush = 0.0
+        flush_timer: Optional[threading.Timer] = None
+        flush_lock = threading.Lock()
+
         def update_progress(current: int, total: int):
             pb_pull.value = current / total
             lbl_status.value = f"正在拉取新闻... (新增 {current}/{total})"
-            page.update()
+
+        def flush_news():
+            nonlocal last_flush, flush_timer
+            with flush_lock:
+                flush_timer = None
+                last_flush = time.monotonic()
+                # 追加也持这把锁，取出和清空之间不会有行被漏掉
+                rows, pending_rows[:] = list(pending_rows), []
+                if rows:
+                    append_news(pd.DataFrame(rows))
+                page.update()
 
         def update_news(row_data: Dict):
-            nonlocal news_df, total_new
+            nonlocal total_new, flush_timer
             title = row_data.get('标题', '')
             
             # Skip if already displayed
@@ -135,53 +204,50 @@ def main(page: ft.Page):
                 
             seen_titles.add(title)
             total_new += 1
-            
-            # Convert single row to DataFrame
-            new_row = pd.DataFrame([row_data])
-            
-            # Update news_df
-            if news_df is None or news_df.empty:
-                news_df = new_row
-            else:
-                news_df = pd.concat([news_df, new_row])
-            
-            # Update intent columns if needed
-            nonlocal intent_columns, selected_intent
-            if not intent_columns:
-                intent_columns = [
-                    c for c in news_df.columns[3:]
-                    if pd.api.types.is_numeric_dtype(news_df[c])
-                ]
-                if intent_columns:
-                    selected_intent = intent_columns[0]
+            with flush_lock:
+                pending_rows.append(row_data)
 
-            # Refresh display
-            if selected_intent:
-                refresh_intent_bar()
-                show_news()
+            wait = FLUSH_INTERVAL - (time.monotonic() - last_flush)
+            if wait <= 0:
+                flush_news()
+            else:
+                # 拉取停顿时也要把攒下的文章显示出来
+                with flush_lock:
+                    if flush_timer is None:
+                        flush_timer = threading.Timer(wait, flush_news)
+                        flush_timer.daemon = True
+                        flush_timer.start()
 
         try:
             import collect_news
             max_articles = int(slider_max_articles.value)
-            news_df = collect_news.fetch_news(
+            # 界面自己增量维护 news_df，collect_news 不必再保留一份
+            collect_news.fetch_news(
                 progress_callback=update_progress,
                 news_callback=update_news,
-                max_articles=max_articles
+                max_articles=max_articles,
+                cancel_event=cancel_event,
+                update_current=False
             )
-            
-            # Final update
-            intent_columns = [
-                c for c in news_df.columns[3:]
-                if pd.api.types.is_numeric_dtype(news_df[c])
-            ]
-            logging.debug(f"Detected intent columns: {intent_columns}")
-            if not intent_columns:
-                logging.error(f"Data frame is empty\n{news_df}")
-                raise ValueError("收集到的新闻没有意向列")
-            selected_intent = intent_columns[0]
-            lbl_status.value = f"已拉取 {total_new} 条新闻，共 {len(intent_columns)} 个意向"
-            refresh_intent_bar()
-            show_news()
+            with flush_lock:
+                if flush_timer is not None:
+                    flush_timer.cancel()
+                    flush_timer = None
+            # 还没显示的文章也走增量路径，汇总和排序不必整个重建
+            flush_news()
+            with ui_lock:
+                # 再补上新闻库里本次拉取之外的新文章，例如后台采集进程写入的
+                new_df, store_cursor = collect_news.load_news_since(store_cursor)
+                if not new_df.empty:
+                    append_news(new_df[~new_df['标题'].isin(seen_titles)].reset_index(drop=True))
+
+                logging.debug(f"Detected intent columns: {intent_columns}")
+                if news_df is None or not intent_columns:
+                    logging.error(f"Data frame is empty\n{news_df}")
+                    raise ValueError("收集到的新闻没有意向列")
+                lbl_status.value = f"已拉取 {total_new} 条新闻，共 {len(intent_columns)} 个意向"
+                if cancel_event.is_set():
+                    lbl_status.value = f"已取消拉取，保留已拉取的 {total_new} 条新闻"
         except Exception as ex:
             lbl_status.value = f"拉取失败：{ex}"
         finally:
@@ -192,14 +258,16 @@ def main(page: ft.Page):
     # 【改动】刷新顶部意向栏
     # ----------------------------------------------------------
     def refresh_intent_bar():
-        if news_df is None or intent_columns == []:
-            lv_intents.controls.clear()
-            return
-        # 计算每个意向的平均值（预测结果）
-        avg_scores = {
-            col: float(news_df[col].mean())
-            for col in intent_columns
-        }
+        window, half_life = prediction_settings()
+        with ui_lock:
+            if news_df is None or intent_columns == []:
+                lv_intents.controls.clear()
+                return
+            # 每个意向按当前时间窗口/半衰期的加权分（预测结果），直接取自增量汇总
+            avg_scores = {
+                col: bayes_predict(aggregates(), col, window, half_life)
+                for col in intent_columns
+            }
         # 按均值降序排序
         sorted_intents = sorted(
             avg_scores.items(), key=lambda x: x[1], reverse=True)
@@ -241,38 +309,161 @@ def main(page: ft.Page):
     # 【改动】点击意向切换
     def select_intent(intent_col: str):
         nonlocal selected_intent
-        selected_intent = intent_col
-        refresh_intent_bar()   # 刷新选中样式
-        show_news()            # 重新展示
+        with ui_lock:
+            selected_intent = intent_col
+            refresh_intent_bar()   # 刷新选中样式
+            show_news()            # 重新展示
 
     # ----------------------------------------------------------
     # 可视化展示
     # ----------------------------------------------------------
-    def show_news():
-        lv_left.controls.clear()
-        lv_right.controls.clear()
-
-        if news_df is None or news_df.empty or selected_intent is None:
+    def aggregates() -> IntentAggregates:
+        nonlocal intent_stats, stats_source
+        with ui_lock:
+            if stats_source is not news_df:
+                intent_stats = IntentAggregates.from_frame(news_df, intent_columns)
+                stats_source = news_df
+            return intent_stats
+
+    def prediction_settings() -> Tuple[Optional[float], Optional[float]]:
+        return WINDOWS[dd_window.value], HALF_LIVES[dd_half_life.value]
+
+    def extend_aggregates(old_df: pd.DataFrame, new_df: pd.DataFrame):
+        """news_df 由 old_df 追加 new_df 得到时，只把新行合并进汇总"""
+        nonlocal stats_source
+        if intent_stats is not None and stats_source is old_df:
+            intent_stats.add_frame(new_df, intent_columns)
+            stats_source = news_df
+
+    def intent_order(col: str) -> Tuple[np.ndarray, np.ndarray]:
+        nonlocal order_source
+        if order_source is not news_df:
+            order_cache.clear()
+            order_source = news_df
+        if col not in order_cache:
+            order_cache[col] = split_by_intent(news_df[col].to_numpy())
+        return order_cache[col]
+
+    def append_page(left: bool) -> bool:
+        """给一栏追加下一页卡片，没有更多时返回 False"""
+        with ui_lock:
+            lv = lv_left if left else lv_right
+            rows = list_rows[left]
+            start = len(lv.controls)
+            if start >= len(rows):
+                return False
+            for pos in rows[start:start + PAGE_SIZE]:
+                lv.controls.append(_build_card(news_df.iloc[pos], left=left))
+            return True
+
+    def on_list_scroll(e: ft.OnScrollEvent, left: bool):
+        if e.max_scroll_extent - e.pixels > LOAD_MORE_PX:
             return
+        if append_page(left):
+            page.update()
 
-        # 使用当前意向列
-        col = selected_intent
-        if col not in news_df.columns:
-            return
+    def insert_rows(positions):
+        """把刚追加到 news_df 末尾的行插到当前意向两栏的排序位置，只为它们新建卡片
+
+        插入位置在已渲染的范围之外时只记下行位置，滚动到那里时再渲染。
+        """
+        nonlocal order_source
+        with ui_lock:
+            col = selected_intent
+            if col not in news_df.columns:
+                return
+            values = news_df[col].to_numpy(dtype=float)
+            for left in (True, False):
+                lv = lv_left if left else lv_right
+                rows = list_rows[left]
+                # 已排好的行按置信度降序，取负后升序，方便二分查找
+                keys = -np.where(values[rows] >= 0.5, values[rows], 1 - values[rows])
+                for pos in positions:
+                    v = values[pos]
+                    if not (v >= 0.5 if left else v < 0.5):
+                        continue
+                    key = -(v if left else 1 - v)
+                    # 同分的排在已有行之后，与 split_by_intent 的稳定排序一致
+                    idx = int(np.searchsorted(keys, key, side="right"))
+                    rendered = len(lv.controls)
+                    if idx < rendered or rendered == len(rows):
+                        lv.controls.insert(idx, _build_card(news_df.iloc[pos], left=left))
+                    rows = np.insert(rows, idx, pos)
+                    keys = np.insert(keys, idx, key)
+                list_rows[left] = rows
+            # 其他意向的排序下次切换时重新计算
+            order_cache.clear()
+            order_cache[col] = (list_rows[True], list_rows[False])
+            order_source = news_df
+
+    def append_news(new_df: pd.DataFrame):
+        """把新文章追加到 news_df 末尾：汇总只合并新行，卡片只为新行创建"""
+        nonlocal news_df, intent_columns, selected_intent
+        with ui_lock:
+            if new_df.empty:
+                return
+            if news_df is None or news_df.empty:
+                news_df = new_df
+                intent_columns = [
+                    c for c in news_df.columns[3:]
+                    if pd.api.types.is_numeric_dtype(news_df[c])
+                ]
+                if intent_columns and selected_intent not in intent_columns:
+                    selected_intent = intent_columns[0]
+                if selected_intent:
+                    refresh_intent_bar()
+                    show_news()
+                return
+
+            start = len(news_df)
+            old_df, news_df = news_df, pd.concat([news_df, new_df], ignore_index=True)
+            extend_aggregates(old_df, new_df)
+            if selected_intent:
+                refresh_intent_bar()
+                insert_rows(range(start, len(news_df)))
+
+    def sync_store():
+        """追加新闻库里界面还没有的文章，例如后台采集进程写入的"""
+        nonlocal store_cursor
+        import collect_news
+        with ui_lock:
+            new_df, store_cursor = collect_news.load_news_since(store_cursor)
+            if not new_df.empty:
+                append_news(new_df)
+                lbl_status.value = f"已从新闻库载入 {len(new_df)} 条新文章"
+                page.update()
 
-        # 构造临时列用于排序
-        news_df["_score"] = news_df[col].apply(
-            lambda v: v if v >= 0.5 else 1 - v)
+    def watch_store():
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            # 任务运行期间由任务自己更新新闻列表
+            if job_cancel is not None:
+                continue
+            try:
+                sync_store()
+            except Exception:
+                logging.exception("读取新闻库失败")
 
-        left_df  = news_df[news_df[col] >= 0.5].sort_values("_score", ascending=False)
-        right_df = news_df[news_df[col] < 0.5].sort_values("_score", ascending=False)
+    def show_news():
+        with ui_lock:
+            # 排序结果按意向缓存，每栏只先渲染一页，切换意向的开销与新闻总数无关
+            lv_left.controls.clear()
+            lv_right.controls.clear()
+            list_rows[True] = list_rows[False] = np.empty(0, dtype=int)
 
-        for _, row in left_df.iterrows():
-            lv_left.controls.append(_build_card(row, left=True))
-        for _, row in right_df.iterrows():
-            lv_right.controls.append(_build_card(row, left=False))
+            if news_df is None or news_df.empty or selected_intent is None:
+                return
 
-        page.update()
+            # 使用当前意向列
+            col = selected_intent
+            if col not in news_df.columns:
+                return
+
+            list_rows[True], list_rows[False] = intent_order(col)
+            append_page(True)
+            append_page(False)
+
+            page.update()
 
     # ----------------------------------------------------------
     # 单条卡片 UI
@@ -319,14 +510,21 @@ def main(page: ft.Page):
             lbl_status.value = "请先拉取新闻"
             page.update()
             return
+        run_job("预测", do_predict)
 
+    def do_predict(cancel_event: threading.Event):
+        intent = selected_intent
         pb_predict.visible = True
-        lbl_status.value = f"正在分类并预测 “{selected_intent}” ..."
+        lbl_status.value = f"正在分类并预测 “{intent}” ..."
         page.update()
 
         try:
-            result = bayes_predict(news_df[selected_intent])
-            show_result(result, selected_intent)
+            result = bayes_predict(aggregates(), intent, *prediction_settings())
+            if cancel_event.is_set():
+                lbl_status.value = "已取消预测"
+                return
+            lbl_status.value = ""
+            show_result(result, intent)
         except Exception as ex:
             lbl_status.value = f"预测失败：{ex}"
         finally:
@@ -397,14 +595,67 @@ def main(page: ft.Page):
     # ----------------------------------------------------------
     # 训练模型
     # ----------------------------------------------------------
+    def reload_news():
+        """重新读取新闻库，例如历史分数重算之后"""
+        nonlocal news_df, intent_columns, selected_intent, store_cursor
+        import collect_news
+        with ui_lock:
+            news_df = collect_news.get_current_news(reload=True)
+            store_cursor = collect_news.current_news_id
+            if news_df is None:
+                return
+            intent_columns = [
+                c for c in news_df.columns[3:]
+                if pd.api.types.is_numeric_dtype(news_df[c])
+            ]
+            if selected_intent not in intent_columns:
+                selected_intent = intent_columns[0] if intent_columns else None
+            if selected_intent:
+                refresh_intent_bar()
+                show_news()
+
     def train_models(e):
+        run_job("训练模型", do_train)
+
+    def do_train(cancel_event: threading.Event):
         try:
+            import collect_news
             import train_news
+            # 已加载的模型内存映射着 weight.bin；Windows 上映射未释放时训练无法替换这些文件
+            collect_news.update_models()
+            pb_train.value = 0
             pb_train.visible = True
             lbl_status.value = "正在训练模型..."
             page.update()
-            
-            result = train_news.start_training()
+
+            def training_progress(done: int, total: int, folder_name: str):
+                pb_train.value = done / total
+                lbl_status.value = f"正在训练模型... [{folder_name}] 完成 ({done}/{total})"
+                page.update()
+
+            result = train_news.start_training(
+                progress_callback=training_progress, cancel_event=cancel_event
+            )
+
+            # 用新模型重算历史新闻的分数，新增的意向也会出现在历史新闻上
+            import rescore
+            collect_news.update_models()
+            if not cancel_event.is_set():
+                pb_train.value = 0
+                lbl_status.value = "正在用新模型重算历史新闻..."
+                page.update()
+
+                def rescore_progress(done: int, total: int):
+                    pb_train.value = done / total if total else 1
+                    lbl_status.value = f"正在用新模型重算历史新闻... ({done}/{total})"
+                    page.update()
+
+                changed = rescore.backfill(progress_callback=rescore_progress, cancel_event=cancel_event)
+                if changed:
+                    result += f"\n\n已重算历史新闻：{', '.join(changed)}"
+                    reload_news()
+            if cancel_event.is_set():
+                result += "\n\n已取消，未完成的意向下次训练时继续"
             
             # 显示训练结果对话框
             def close_dlg(e):
@@ -422,7 +673,7 @@ def main(page: ft.Page):
             
             page.overlay.append(dlg)
             dlg.open = True
-            lbl_status.value = "训练完成"
+            lbl_status.value = "已取消训练" if cancel_event.is_set() else "训练完成"
             
         except ImportError:
             lbl_status.value = "未找到训练模块"
@@ -432,6 +683,49 @@ def main(page: ft.Page):
             pb_train.visible = False
             page.update()
 
+    # ----------------------------------------------------------
+    # 后台任务：拉取、训练、预测在后台线程运行，期间仍可切换意向、浏览新闻
+    # ----------------------------------------------------------
+    job_cancel: Optional[threading.Event] = None
+
+    def set_busy(busy: bool):
+        for btn in (btn_pull, btn_pull_refresh, btn_predict, btn_train):
+            btn.disabled = busy
+        btn_cancel.visible = busy
+        btn_cancel.disabled = False
+
+    def run_job(name: str, work):
+        """在后台线程运行 work(cancel_event)；同一时间只运行一个任务"""
+        nonlocal job_cancel
+        if job_cancel is not None:
+            lbl_status.value = "已有任务在运行，请等待完成或取消"
+            page.update()
+            return
+        cancel_event = job_cancel = threading.Event()
+        set_busy(True)
+        page.update()
+
+        def runner():
+            nonlocal job_cancel
+            try:
+                work(cancel_event)
+            except Exception as ex:
+                logging.exception(f"{name}失败")
+                lbl_status.value = f"{name}失败：{ex}"
+            finally:
+                job_cancel = None
+                set_busy(False)
+                page.update()
+
+        threading.Thread(target=runner, name=name, daemon=True).start()
+
+    def cancel_job(e):
+        if job_cancel is not None:
+            job_cancel.set()
+            btn_cancel.disabled = True
+            lbl_status.value = "正在取消..."
+            page.update()
+
     # ----------------------------------------------------------
     # 按钮
     # ----------------------------------------------------------
@@ -451,6 +745,7 @@ def main(page: ft.Page):
         bgcolor=ft.Colors.RED_400,
         color=ft.Colors.WHITE,
     )
+    btn_cancel = ft.OutlinedButton("取消", on_click=cancel_job, width=120, visible=False)
 
     # ----------------------------------------------------------
     # 滑动条：最大新闻数量
@@ -468,12 +763,33 @@ def main(page: ft.Page):
         on_change=update_slider_label
     )
 
+    # ----------------------------------------------------------
+    # 下拉框：预测使用的时间窗口和衰减半衰期
+    # ----------------------------------------------------------
+    def on_prediction_settings(e):
+        if news_df is not None:
+            refresh_intent_bar()
+    dd_window = ft.Dropdown(
+        label="时间窗口",
+        options=[ft.dropdown.Option(key) for key in WINDOWS],
+        value="全部",
+        width=140,
+        on_change=on_prediction_settings
+    )
+    dd_half_life = ft.Dropdown(
+        label="半衰期",
+        options=[ft.dropdown.Option(key) for key in HALF_LIVES],
+        value="1 天",
+        width=140,
+        on_change=on_prediction_settings
+    )
+
     # ----------------------------------------------------------
     # 页面布局
     # ----------------------------------------------------------
     page.add(
         ft.Column([
-            ft.Row([btn_pull, btn_pull_refresh, btn_predict, btn_train], 
+            ft.Row([btn_pull, btn_pull_refresh, btn_predict, btn_train, btn_cancel], 
                   alignment=ft.MainAxisAlignment.CENTER),
             pb_pull,
             pb_predict,
@@ -490,21 +806,41 @@ def main(page: ft.Page):
             ft.Divider(height=1),
             ft.Row([
                 ft.Text("设置", size=18, weight=ft.FontWeight.BOLD),
+                dd_window,
+                dd_half_life,
                 slider_max_articles
             ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
         ], expand=True)
     )
 
-    # 启动即加载
+    # 启动即加载，之后定期读取后台采集进程写入的新文章
     load_excel_on_start()
+    threading.Thread(target=watch_store, name="watch_store", daemon=True).start()
 
 # ----------------------------------------------------------
 # 预测逻辑（保持不变）
 # ----------------------------------------------------------
-def bayes_predict(values: pd.Series) -> float:
-    if values.empty:
-        return 0.5
-    return float(values.mean())
+def split_by_intent(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """按置信度从高到低排好的行位置：左栏分数 >= 0.5，右栏 < 0.5"""
+    values = np.asarray(values, dtype=float)
+    confidence = np.where(values >= 0.5, values, 1 - values)
+    order = np.argsort(-confidence, kind="stable")
+    ordered = values[order]
+    return order[ordered >= 0.5], order[ordered < 0.5]
+
+
+def bayes_predict(
+    stats: IntentAggregates,
+    intent: str,
+    window: Optional[float] = None,
+    half_life: Optional[float] = None
+) -> float:
+    """意向的近期加权平均分：只看最近 window 秒内的新闻，权重每 half_life 秒减半
+
+    从增量汇总中直接读出；窗口内没有新闻时返回 0.5（无法判断）。
+    """
+    score, _ = stats.score(intent, window=window, half_life=half_life)
+    return 0.5 if math.isnan(score) else score
 
 # ----------------------------------------------------------
 # 入口
@@ -0,0 +1,45 @@
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，最多攒 capacity 个突发"""
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，不够时阻塞到轮到自己为止"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 令牌可以透支，透支越多后来者排得越靠后
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """按域名分别限速，不同站点之间互不影响"""
+
+    def __init__(self, rate: float = 2.0, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str):
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.capacity)
+        bucket.acquire()
@@ -0,0 +1,138 @@
+"""模型更新后给新闻库里的历史文章重新打分
+
+只重算模型版本（classifier.model_version）变过的意向以及新增的意向，正文直接从
+新闻库读取，不重新下载。文章按 id 分批交给多个子进程打分，每批写回一次，只覆盖
+这些意向的分数；(正文, 模型版本) 算过的组合直接取 score_cache 里的结果。
+
+用法: python rescore.py [--workers N] [--batch-size N] [--all]
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Callable, Dict, List, Optional
+
+BATCH_SIZE = 500
+
+# 子进程里的打分器，由 _init_worker 加载
+_scorer = None
+
+
+def changed_models(store, base_folder: str = 'train_set', force: bool = False) -> Dict[str, str]:
+    """返回需要重算的 {意向: 当前版本}"""
+    from classifier import read_version
+    from collect_news import model_files
+    recorded = store.model_versions()
+    current = {name: read_version(path) for name, path in model_files(base_folder).items()}
+    return {name: version for name, version in current.items() if force or recorded.get(name) != version}
+
+
+def _init_worker(base_folder: str, names: List[str]):
+    global _scorer
+    from classifier import build_scorer
+    from collect_news import load_all_models
+    _scorer = build_scorer(load_all_models(base_folder, names))
+
+
+def _score_batch(batch):
+    """给一批 (id, 内容) 打分，返回 [(id, 意向, 分数), ...]"""
+    from score_cache import score_texts
+    ids = [article_id for article_id, _ in batch]
+    values = score_texts([content for _, content in batch], _scorer)
+    return [
+        (article_id, name, float(f'{value:.4f}'))
+        for article_id, row in zip(ids, values)
+        for name, value in zip(_scorer['names'], row)
+    ]
+
+
+def backfill(
+    base_folder: str = 'train_set',
+    workers: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+    force: bool = False,
+    progress_callback: Callable[[int, int], None] = None,
+    cancel_event: Optional[threading.Event] = None
+) -> Dict[str, str]:
+    """重算变化过的意向，返回重算了哪些意向 {意向: 版本}
+
+    workers 为 0 时在本进程里打分；progress_callback(已完成篇数, 总篇数)。
+    全部写完才记录新版本，中途失败或被 cancel_event 取消时返回空字典，
+    下次会重新来过。
+    """
+    from collect_news import get_store
+    store = get_store()
+    changed = changed_models(store, base_folder, force)
+    if not changed:
+        return {}
+    names = list(changed)
+    total = len(store)
+    done = 0
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def record(scores):
+        nonlocal done
+        store.write_scores(scores)
+        done += len(scores) // len(names)
+        if progress_callback:
+            progress_callback(done, total)
+
+    if workers == 0:
+        _init_worker(base_folder, names)
+        for batch in store.article_batches(batch_size):
+            if cancelled():
+                return {}
+            record(_score_batch(batch))
+    else:
+        workers = workers or os.cpu_count() or 1
+        # spawn 避免子进程继承父进程的 SQLite 连接
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(base_folder, names)
+        ) as pool:
+            # 同时在途的批次有上限，不会把整个新闻库一次读进内存
+            pending = set()
+            for batch in store.article_batches(batch_size):
+                if cancelled():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    return {}
+                pending.add(pool.submit(_score_batch, batch))
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record(future.result())
+            for future in as_completed(pending):
+                if cancelled():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    return {}
+                record(future.result())
+
+    for name, version in changed.items():
+        store.set_model_version(name, version)
+    return changed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="用最新的模型重算新闻库中的意向分数")
+    parser.add_argument("--workers", type=int, default=None, help="打分进程数，0 表示不用子进程")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--all", action="store_true", help="忽略版本记录，重算所有意向")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    changed = backfill(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        force=args.all,
+        progress_callback=lambda done, total: print(f"\r已重算 {done}/{total} 篇", end='', flush=True)
+    )
+    if changed:
+        print(f"\n已重算意向 {', '.join(changed)}，耗时 {time.perf_counter() - started:.1f} 秒")
+    else:
+        print("模型没有变化，无需重算")
@@ -0,0 +1,92 @@
+"""按 (文章内容哈希, 模型版本) 缓存意向分数
+
+正文和模型都没变时分数一定不变：重打分、重复拉取同一篇文章时只计算新的组合。
+模型版本见 classifier.model_version，文章哈希与分词缓存相同（token_cache.content_hash）。
+"""
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CACHE_PATH = 'score_cache.sqlite'
+# 单条 SQL 里 IN (...) 的参数个数上限
+QUERY_CHUNK = 500
+
+_cache = None
+_lock = threading.Lock()
+
+
+class ScoreCache:
+    def __init__(self, path: str = CACHE_PATH):
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS scores (
+                    hash TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (hash, version)
+                ) WITHOUT ROWID
+            ''')
+            self.conn.commit()
+
+    def get_many(self, hashes: Iterable[str], versions: Iterable[str]) -> Dict[Tuple[str, str], float]:
+        wanted = set(versions)
+        hashes = list(set(hashes))
+        found = {}
+        with self.lock:
+            for start in range(0, len(hashes), QUERY_CHUNK):
+                chunk = hashes[start:start + QUERY_CHUNK]
+                rows = self.conn.execute(
+                    f'SELECT hash, version, score FROM scores WHERE hash IN ({",".join("?" * len(chunk))})',
+                    chunk
+                )
+                for key, version, score in rows:
+                    if version in wanted:
+                        found[key, version] = score
+        return found
+
+    def put_many(self, scores: Iterable[Tuple[str, str, float]]):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO scores (hash, version, score) VALUES (?, ?, ?)', scores
+            )
+
+
+def get_cache() -> ScoreCache:
+    """每个进程一个连接，子进程第一次用到时各自打开"""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ScoreCache()
+    return _cache
+
+
+def score_texts(texts: List[str], scorer: Dict, cache: Optional[ScoreCache] = None):
+    """与 classifier.check_batch 相同的 (新闻数, 模型数) 分数数组，已缓存的组合不再计算"""
+    import numpy as np
+    from classifier import check_batch
+    from token_cache import content_hash
+
+    cache = cache or get_cache()
+    versions = scorer['versions']
+    hashes = [content_hash(text) for text in texts]
+    known = cache.get_many(hashes, [v for v in versions if v])
+    scores = np.array([
+        [known.get((key, version), np.nan) if version else np.nan for version in versions]
+        for key in hashes
+    ], dtype=float).reshape(len(texts), len(versions))
+
+    # 只要有一个模型没命中就整篇重算，check_batch 一次算出所有模型
+    missing = np.flatnonzero(np.isnan(scores).any(axis=1))
+    if len(missing):
+        computed = check_batch([texts[i] for i in missing], scorer)
+        new = []
+        for row, i in zip(computed, missing):
+            for j, version in enumerate(versions):
+                if np.isnan(scores[i, j]):
+                    scores[i, j] = row[j]
+                    if version:
+                        new.append((hashes[i], version, float(row[j])))
+        cache.put_many(new)
+    return scores
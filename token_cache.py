@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# 内存 LRU 的最大条目数
+MAX_ENTRIES = 20000
+# 新的分词结果先攒在内存里，每攒够这么多条一次写入磁盘缓存
+COMMIT_EVERY = 500
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_disk = None
+# 尚未写入磁盘的 [(hash, words_json)]；分词期间不占用数据库的写锁
+_pending = []
+_jieba = None
+
+# jieba 词典序列化缓存的位置；默认的系统临时目录可能被清理，导致每次启动都要重建
+JIEBA_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+
+
+def get_jieba():
+    """首次分词时才导入 jieba 并加载词典，之后复用同一个实例"""
+    global _jieba
+    if _jieba is None:
+        import jieba
+        # newspaper3k 依赖的 jieba3k 是旧版本，没有 jieba.dt，只能用默认缓存位置
+        if hasattr(jieba, 'dt'):
+            os.makedirs(JIEBA_CACHE_DIR, exist_ok=True)
+            jieba.dt.tmp_dir = JIEBA_CACHE_DIR
+        jieba.initialize()
+        _jieba = jieba
+    return _jieba
+
+
+def content_hash(text: str) -> str:
+    """分词缓存和分数缓存（score_cache）共用的内容键"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def enable_disk_cache(path: str = 'token_cache.sqlite'):
+    """开启磁盘缓存，之后的分词结果会跨进程、跨运行复用"""
+    global _disk
+    disable_disk_cache()
+    with _lock:
+        _disk = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL 下读不阻塞写，并行训练的多个进程共用同一个缓存文件
+        _disk.execute('PRAGMA journal_mode=WAL')
+        _disk.execute(
+            'CREATE TABLE IF NOT EXISTS tokens (hash TEXT PRIMARY KEY, words TEXT NOT NULL)'
+        )
+        _disk.commit()
+
+
+def disable_disk_cache():
+    global _disk
+    flush()
+    with _lock:
+        if _disk is not None:
+            _disk.close()
+        _disk = None
+
+
+def flush():
+    """把尚未落盘的分词结果一次写入"""
+    with _lock:
+        _write_pending()
+
+
+def _write_pending():
+    # 调用方持有 _lock；一个 executemany 一个短事务，写锁只占用这一下
+    if _disk is not None and _pending:
+        with _disk:
+            _disk.executemany('INSERT OR REPLACE INTO tokens (hash, words) VALUES (?, ?)', _pending)
+    _pending.clear()
+
+
+def clear():
+    """清空内存缓存（磁盘缓存不受影响）"""
+    with _lock:
+        _lru.clear()
+
+
+def put(text: str, words: frozenset):
+    """放入在别处（例如另一个子进程里）已经算好的分词结果，只进内存缓存"""
+    with _lock:
+        _remember(content_hash(text), frozenset(words))
+
+
+def tokenize(text: str) -> frozenset:
+    """返回文本去重后的词集合；同一内容只会调用一次 jieba"""
+    key = content_hash(text)
+    with _lock:
+        words = _lru.get(key)
+        if words is not None:
+            _lru.move_to_end(key)
+            return words
+        if _disk is not None:
+            row = _disk.execute('SELECT words FROM tokens WHERE hash = ?', (key,)).fetchone()
+            if row is not None:
+                words = frozenset(json.loads(row[0]))
+                _remember(key, words)
+                return words
+
+    # 分词本身不持锁，其他线程可以同时查缓存
+    words = frozenset(get_jieba().cut(text))
+
+    with _lock:
+        _remember(key, words)
+        if _disk is not None:
+            _pending.append((key, json.dumps(list(words), ensure_ascii=False)))
+            if len(_pending) >= COMMIT_EVERY:
+                _write_pending()
+    return words
+
+
+def _remember(key, words):
+    _lru[key] = words
+    _lru.move_to_end(key)
+    while len(_lru) > MAX_ENTRIES:
+        _lru.popitem(last=False)
@@ -1,5 +1,18 @@
 import os
-from classifier import train, save
+import io
+import time
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional
+from classifier import train, save, load_counts, new_model, partial_fit, merge, refresh_wordlist
+import token_cache
+
+# 用文件末尾这些字节的摘要判断样本文件是否只是被追加
+TAIL_BYTES = 256
+# 并行训练时大语料按这么多行切块分发
+CHUNK_SIZE = 20000
 
 def load_dataset(pos_file, neg_file):
     """Load positive and negative samples from files"""
@@ -28,11 +41,165 @@ def load_dataset(pos_file, neg_file):
     
     return news_data, labels
 
+def read_appended(path, source=None):
+    """Read lines appended to path since the recorded source state.
+
+    Returns (lines, new_source), or None if the file was rewritten rather
+    than appended to and the folder has to be retrained from scratch.
+    """
+    offset = source.get('offset', 0) if source else 0
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size < offset:
+                return None
+            if offset:
+                start = max(0, offset - TAIL_BYTES)
+                f.seek(start)
+                if hashlib.sha1(f.read(offset - start)).hexdigest() != source.get('tail'):
+                    return None
+            f.seek(offset)
+            data = f.read()
+            f.seek(max(0, size - TAIL_BYTES))
+            tail = f.read()
+    except FileNotFoundError:
+        if offset:
+            return None
+        print(f"Warning: Could not find samples file: {path}")
+        return [], {'offset': 0, 'tail': hashlib.sha1(b'').hexdigest()}
+
+    lines = [
+        line.strip()
+        for line in io.StringIO(data.decode('utf-8'), newline=None)
+        if line.strip()  # Skip empty lines
+    ]
+    return lines, {'offset': size, 'tail': hashlib.sha1(tail).hexdigest()}
+
+def prepare_folder(folder_path):
+    """Load a folder's existing counts and the samples it has not seen yet.
+
+    Returns (model, news_data, labels, sources); model is a fresh empty
+    one whenever the folder has to be retrained from scratch.
+    """
+    pos_file = os.path.join(folder_path, "a.txt")
+    neg_file = os.path.join(folder_path, "b.txt")
+    weight_file = os.path.join(folder_path, "weight.bin")
+
+    # Older folders only have weight.json; continue from it and write weight.bin
+    model = None
+    for existing in (weight_file, os.path.join(folder_path, "weight.json")):
+        if not os.path.exists(existing):
+            continue
+        try:
+            model = load_counts(existing)
+        except Exception as e:
+            print(f"Warning: Could not load existing weights {existing}: {e}")
+        break
+
+    # Weights without recorded offsets come from a full run; start over
+    sources = model.get('sources') if model else None
+    pos = neg = None
+    if sources:
+        pos = read_appended(pos_file, sources.get('a.txt'))
+        neg = read_appended(neg_file, sources.get('b.txt'))
+    if pos is None or neg is None:
+        model = new_model()
+        pos = read_appended(pos_file)
+        neg = read_appended(neg_file)
+
+    (pos_lines, pos_source), (neg_lines, neg_source) = pos, neg
+    news_data = pos_lines + neg_lines
+    labels = [1] * len(pos_lines) + [0] * len(neg_lines)
+    return model, news_data, labels, {'a.txt': pos_source, 'b.txt': neg_source}
+
+def finish_folder(folder_path, model, new_samples, sources):
+    """Save a folder's updated weights; returns None if it has no data at all"""
+    weight_file = os.path.join(folder_path, "weight.bin")
+    if model['total_data'] == 0:
+        return None
+    if new_samples or not os.path.exists(weight_file) or model.get('sources') != sources:
+        model['sources'] = sources
+        save(model, weight_file)
+    return model
+
+def train_folder(folder_path):
+    """Train a single folder, absorbing only newly appended samples when possible.
+
+    Returns (training_result, new_samples); training_result is None when
+    the folder has no training data at all.
+    """
+    model, news_data, labels, sources = prepare_folder(folder_path)
+    if news_data:
+        partial_fit(model, news_data, labels)
+    return finish_folder(folder_path, model, len(news_data), sources), len(news_data)
+
+def _count_chunk(news_data, labels):
+    """Worker: tokenize one chunk and return its raw counts"""
+    counts = partial_fit(new_model(), news_data, labels, refresh=False)
+    # Write this chunk's new tokens before reporting back, so nothing is left pending while idle
+    token_cache.flush()
+    return counts
+
+def _train_parallel(subfolders, workers, cache_path, on_folder_done=None, cancel_event=None):
+    """Fan folders, split into chunks, out to a process pool and merge the counts.
+
+    Returns {folder: (training_result, new_samples, seconds)}; when cancelled,
+    only the folders that were already finished (and saved) are included.
+    """
+    prepared = {}
+    pending = {}
+    started = {}
+    done = {}
+    # spawn 避免子进程继承父进程的 SQLite 连接
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=token_cache.enable_disk_cache,
+        initargs=(cache_path,)
+    ) as pool:
+        futures = {}
+        for folder in subfolders:
+            started[folder] = time.perf_counter()
+            model, news_data, labels, sources = prepare_folder(folder)
+            prepared[folder] = (model, len(news_data), sources)
+            pending[folder] = 0
+            for start in range(0, len(news_data), CHUNK_SIZE):
+                future = pool.submit(
+                    _count_chunk,
+                    news_data[start:start + CHUNK_SIZE],
+                    labels[start:start + CHUNK_SIZE]
+                )
+                futures[future] = folder
+                pending[folder] += 1
+
+        def _finish(folder):
+            model, new_samples, sources = prepared.pop(folder)
+            refresh_wordlist(model)
+            result = finish_folder(folder, model, new_samples, sources)
+            done[folder] = (result, new_samples, time.perf_counter() - started[folder])
+            if on_folder_done:
+                on_folder_done(folder)
+
+        for folder in subfolders:
+            if not pending[folder]:
+                _finish(folder)
+        for future in as_completed(futures):
+            if cancel_event is not None and cancel_event.is_set():
+                pool.shutdown(wait=False, cancel_futures=True)
+                break
+            folder = futures[future]
+            merge(prepared[folder][0], future.result(), refresh=False)
+            pending[folder] -= 1
+            if not pending[folder]:
+                _finish(folder)
+    return done
+
 def process_folder(folder_path):
     """Process a single training folder"""
     pos_file = os.path.join(folder_path, "a.txt")
     neg_file = os.path.join(folder_path, "b.txt")
-    weight_file = os.path.join(folder_path, "weight.json")
+    weight_file = os.path.join(folder_path, "weight.bin")
     
     # Load datasets
     print(f"\nProcessing folder: {folder_path}")
@@ -55,8 +222,20 @@ def process_folder(folder_path):
     print(f"Positive samples: {training_result['positive_data']}")
     print(f"Negative samples: {training_result['nagetive_data']}")
 
-def start_training() -> str:
-    """Start training process and return result message"""
+def start_training(
+    parallel: bool = False,
+    workers: int = None,
+    progress_callback: Callable[[int, int, str], None] = None,
+    cancel_event: Optional[threading.Event] = None
+) -> str:
+    """Start training process and return result message
+
+    With parallel=True the folders (and large corpora, in chunks of
+    CHUNK_SIZE lines) are tokenized on a pool of worker processes.
+    progress_callback(finished, total, folder_name) is called as each
+    folder is saved. Setting cancel_event stops before the next folder;
+    folders already saved keep their new weights.
+    """
     try:
         # Define base folder
         set_folder = "train_set"
@@ -69,38 +248,69 @@ def start_training() -> str:
         
         if not subfolders:
             return "错误：训练集文件夹中没有子文件夹！"
+
+        # 重新训练时复用以前的分词结果
+        cache_path = os.path.join(set_folder, "token_cache.sqlite")
+        token_cache.enable_disk_cache(cache_path)
+
+        finished = 0
+
+        def folder_done(folder):
+            nonlocal finished
+            finished += 1
+            if progress_callback:
+                progress_callback(finished, len(subfolders), os.path.basename(folder))
+
+        if parallel:
+            trained = _train_parallel(subfolders, workers, cache_path, folder_done, cancel_event)
+        else:
+            trained = {}
+            for folder in subfolders:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                # Train incrementally and save the weights
+                started = time.perf_counter()
+                training_result, new_samples = train_folder(folder)
+                trained[folder] = (training_result, new_samples, time.perf_counter() - started)
+                folder_done(folder)
         
-        # Process each subfolder
+        # Report each subfolder
         results = []
         for folder in subfolders:
             folder_name = os.path.basename(folder)
-            pos_file = os.path.join(folder, "a.txt")
-            neg_file = os.path.join(folder, "b.txt")
-            weight_file = os.path.join(folder, "weight.json")
-            
-            # Load datasets
-            news_data, labels = load_dataset(pos_file, neg_file)
-            
-            if not news_data:
+            if folder not in trained:
+                results.append(f"[{folder_name}] 已取消")
+                continue
+            training_result, new_samples, seconds = trained[folder]
+
+            if training_result is None:
                 results.append(f"[{folder_name}] 错误：无训练数据")
                 continue
-            
-            # Train the classifier
-            training_result = train(news_data, labels)
-            
-            # Save the weights
-            save(training_result, weight_file)
-            
+
             results.append(
-                f"[{folder_name}] 完成：共 {len(news_data)} 样本"
+                f"[{folder_name}] 完成：新增 {new_samples} 样本，"
+                f"共 {training_result['total_data']} 样本"
                 f"（正面 {training_result['positive_data']}，"
-                f"负面 {training_result['nagetive_data']}）"
+                f"负面 {training_result['nagetive_data']}），"
+                f"耗时 {seconds:.2f} 秒"
             )
         
         return "\n".join(results)
         
     except Exception as e:
         return f"训练过程出错：{str(e)}"
+    finally:
+        token_cache.flush()
 
 if __name__ == "__main__":
-    print(start_training())
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="训练 train_set 下的所有意向模型")
+    parser.add_argument("--parallel", action="store_true", help="使用多进程并行训练")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认等于 CPU 核数")
+    parser.add_argument("--rescore", action="store_true", help="训练后用新模型重算新闻库中的历史分数")
+    args = parser.parse_args()
+    print(start_training(parallel=args.parallel, workers=args.workers))
+    if args.rescore:
+        import rescore
+        changed = rescore.backfill(workers=args.workers)
+        print(f"已重算意向: {', '.join(changed)}" if changed else "模型没有变化，无需重算")
\ No newline at end of file